@@ -41,12 +41,7 @@ def create_user_and_pwd(db:PWDB, user:Person):
     while True:
         username = input("username: ")
         # Check username uniqueness
-        username_taken = False
-        for record in db.read_records():
-            if record.get("username") == username:
-                username_taken = True
-                break
-        if username_taken:
+        if db.find_by("username", username):
             print("Username already exists. Please choose another.")
             continue
 
@@ -165,7 +160,7 @@ def create_database()-> list[USDB|PWDB]:
         pass_db_name = "PassData"
 
     user_db = USDB(user_db_name)
-    pass_db = PWDB(pass_db_name)
+    pass_db = PWDB(pass_db_name, users=user_db)
 
     return [user_db, pass_db]
 
@@ -0,0 +1,95 @@
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class Aggregates:
+    def __init__(self, bank_code: Callable[[Dict[str, Any]], Optional[str]]) -> None:
+        """Totals over every record, kept current by applying each change as
+        a delta instead of scanning the records again.
+        Args:
+            bank_code: Resolves a stored bank_account to its bank's id code
+        """
+        self._bank_code = bank_code
+        self.records = 0
+        self.balance_by_bank: Dict[str, float] = {}
+        self.count_by_bank: Dict[str, int] = {}
+        self.count_by_account_type: Dict[str, int] = {}
+        self.count_by_level: Dict[int, int] = {}
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Drop every total and compute them again from the records."""
+        self.records = 0
+        self.balance_by_bank, self.count_by_bank = {}, {}
+        self.count_by_account_type, self.count_by_level = {}, {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self._apply(record, 1)
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        self._apply(record, -1)
+
+    def check(self, record: Dict[str, Any]) -> None:
+        """Nothing to validate."""
+
+    def _apply(self, record: Dict[str, Any], sign: int) -> None:
+        self.records += sign
+        account = record.get("bank_account")
+        if not account:
+            return
+        _count(self.count_by_account_type, account.get("account_type"), sign)
+        _count(self.count_by_level, account.get("level"), sign)
+        bank = self._bank_code(account)
+        if bank is not None:
+            balance = round(
+                self.balance_by_bank.get(bank, 0.0)
+                + sign * float(account.get("balance") or 0.0),
+                2,
+            )
+            if _count(self.count_by_bank, bank, sign):
+                self.balance_by_bank[bank] = balance
+            else:
+                self.balance_by_bank.pop(bank, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "balance_by_bank": dict(self.balance_by_bank),
+            "count_by_bank": dict(self.count_by_bank),
+            "count_by_account_type": dict(self.count_by_account_type),
+            "count_by_level": dict(self.count_by_level),
+        }
+
+    def load(self, values: Dict[str, Any]) -> None:
+        """Restore totals saved with to_dict() (JSON turns level keys into
+        strings).
+        Raises:
+            ValueError: If values is not a saved set of totals
+        """
+        try:
+            records = int(values["records"])
+            balance_by_bank = {k: float(v) for k, v in values["balance_by_bank"].items()}
+            count_by_bank = {k: int(v) for k, v in values["count_by_bank"].items()}
+            count_by_account_type = {
+                k: int(v) for k, v in values["count_by_account_type"].items()
+            }
+            count_by_level = {int(k): int(v) for k, v in values["count_by_level"].items()}
+        except (KeyError, TypeError, AttributeError, ValueError):
+            raise ValueError("Corrupt aggregates") from None
+        self.records = records
+        self.balance_by_bank, self.count_by_bank = balance_by_bank, count_by_bank
+        self.count_by_account_type = count_by_account_type
+        self.count_by_level = count_by_level
+
+    def __repr__(self) -> str:
+        return f"Aggregates(records={self.records})"
+
+
+def _count(counts: Dict[Any, int], key: Any, sign: int) -> int:
+    """Add sign to counts[key], dropping the key at zero; returns the count."""
+    count = counts.get(key, 0) + sign
+    if count:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+    return count
@@ -0,0 +1,493 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Pack.Structure.Codec import JsonCodec
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+Records = Dict[int, Dict[str, Any]]
+
+
+def _lock_file(f: IO) -> None:
+    """Block until this process holds the exclusive advisory lock on f."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:  # LK_LOCK gives up after ~10 seconds
+            time.sleep(0.01)
+
+
+def _unlock_file(f: IO) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def replace_file(
+    path: str, write: Callable[[IO], None], mode: str = "w", sync: bool = False
+) -> None:
+    """Write a file next to path and rename it over path.
+
+    Readers opening path see either the old or the new content in full,
+    never a half-written file.
+    """
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, mode) as f:
+        write(f)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def _file_id(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _file_id_of(f: IO) -> tuple:
+    st = os.fstat(f.fileno())
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def apply_op(records: Records, op: Dict[str, Any]) -> None:
+    """Apply a single mutation to an id-keyed record mapping.
+
+    Replaying the same op twice leaves the mapping unchanged, so a journal can
+    safely be replayed over a snapshot that already contains some of it.
+    """
+    kind = op["op"]
+    if kind == "create":
+        records[op["record"]["id"]] = op["record"]
+    elif kind == "update":
+        if op["id"] in records:
+            records[op["id"]] = {**records[op["id"]], **op["data"]}
+    elif kind == "delete":
+        records.pop(op["id"], None)
+    else:
+        raise ValueError(f"Unknown journal operation {kind!r}")
+
+
+class StorageBackend:
+    """Where a DataBase keeps its records.
+
+    DataBase owns the decoded records and applies every mutation to them
+    first; a backend only has to load them, persist the applied ops and
+    report a token that changes whenever another writer touched the store.
+    """
+
+    path: str
+    # whether token() values stay valid across processes and restarts, so
+    # they can be stored to tell whether saved derived data is current
+    persistent_token = False
+    # whether persist() writes its meta side tables in the same transaction
+    # as the records, so saved derived data always matches the records
+    transactional_meta = False
+
+    def __init__(self) -> None:
+        self._thread_lock = threading.RLock()
+        self._lock_handle: Optional[IO] = None
+        self._lock_depth = 0
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Hold the writer lock shared by every process using this store.
+
+        It is an advisory lock on <path>.lock, so only writers take it:
+        readers keep reading the last complete state. Reentrant within
+        the process.
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                self._lock_handle = open(f"{self.path}.lock", "a+")
+                _lock_file(self._lock_handle)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    _unlock_file(self._lock_handle)
+                    self._lock_handle.close()
+                    self._lock_handle = None
+
+    def token(self) -> Any:
+        """Value that changes when the stored data changes."""
+        raise NotImplementedError
+
+    def load(self) -> Records:
+        """Read every record, keyed by id in id order."""
+        raise NotImplementedError
+
+    def read_changes(self) -> Optional[List[Dict[str, Any]]]:
+        """Ops other writers stored since this backend last loaded, read
+        or wrote, without a full load; None if the store can't tell, so
+        DataBase loads everything again."""
+        return None
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield every record in id order; override to avoid a full load."""
+        yield from self.load().values()
+
+    def read_page(self, after_id: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Up to limit records with an id above after_id, in id order, read
+        without a full load; None if the store can't, so DataBase pages
+        its loaded records instead."""
+        return None
+
+    def find(self, field: str, value: Any) -> Optional[List[Dict[str, Any]]]:
+        """Records whose field equals value, in id order, read through the
+        store's own index without a full load; None if the store can't."""
+        return None
+
+    def persist(
+        self,
+        records: Records,
+        ops: List[Dict[str, Any]],
+        sync: bool = False,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Store ops that were already applied to records, all or none of
+        them; with sync, wait until they reached the disk. meta maps side
+        table names to values saved with them (in the same transaction
+        when transactional_meta is set)."""
+        raise NotImplementedError
+
+    def compact(self, records: Records) -> None:
+        """Reclaim space; a no-op unless the backend keeps a log."""
+
+    def read_meta(self, name: str) -> Any:
+        """Read a small side table stored next to the records (None if absent)."""
+        try:
+            with open(f"{self.path}.{name}.json", "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return None
+
+    def write_meta(self, name: str, value: Any) -> None:
+        """Replace a side table atomically."""
+        replace_file(
+            f"{self.path}.{name}.json", lambda f: json.dump(value, f, indent=4)
+        )
+
+    def close(self) -> None:
+        """Release any handle held by the backend."""
+
+
+class FileBackend(StorageBackend):
+    persistent_token = True
+
+    def __init__(
+        self,
+        path: str,
+        codec: Any = JsonCodec(),
+        journal: bool = False,
+        compact_threshold: Optional[int] = 1000,
+    ) -> None:
+        """Single snapshot file, optionally with an append-only journal.
+        Args:
+            path: Snapshot file path
+            codec: File format of the snapshot (see Codec.py)
+            journal: Append mutations to <path>.journal instead of rewriting
+            compact_threshold: Journal entries before an automatic compaction
+                (None disables it, compact() can still be called by hand)
+        """
+        super().__init__()
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self._codec = codec
+        self._mode = "b" if codec.binary else ""
+        self._journal = journal
+        self._compact_threshold = compact_threshold
+        self._journal_entries = 0
+        # snapshot the records were last read from, and how far into the
+        # journal (bytes), so read_changes() only parses what came after
+        self._snapshot_id: Optional[tuple] = None
+        self._journal_offset = 0
+        if not os.path.exists(self.path):
+            with self.lock():
+                if not os.path.exists(self.path):
+                    self._save_records([])
+
+    def token(self) -> tuple:
+        """Identify the on-disk state by (mtime, size, inode) of each file."""
+        return (_file_id(self.path), _file_id(self.journal_path))
+
+    def _read_snapshot(self) -> List[Dict[str, Any]]:
+        """Parse the snapshot file, ignoring any journal."""
+        try:
+            with open(self.path, "r" + self._mode) as f:
+                return self._codec.load(f)
+        except (ValueError, FileNotFoundError):
+            return []
+
+    def _read_journal(self, start: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Parse the journal from a byte offset, stopping at a torn
+        (half-written) last line.
+        Returns:
+            The ops read and the offset after the last complete line
+        """
+        ops, offset = [], start
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(start)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        op = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    # a transaction is one line, so a torn write drops all of it
+                    ops.extend(op["ops"] if op["op"] == "batch" else [op])
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        return ops, offset
+
+    def load(self) -> Records:
+        while True:
+            snapshot = _file_id(self.path)
+            records = {r["id"]: r for r in self._read_snapshot()}
+            ops, offset = self._read_journal() if self._journal else ([], 0)
+            # a compaction between the two reads would pair the old snapshot
+            # with the emptied journal; the renamed snapshot gives it away
+            if _file_id(self.path) == snapshot:
+                break
+        for op in ops:
+            apply_op(records, op)
+        self._journal_entries = len(ops)
+        self._snapshot_id, self._journal_offset = snapshot, offset
+        return records
+
+    def read_changes(self) -> Optional[List[Dict[str, Any]]]:
+        """Journal entries appended after the ones already read; None
+        without a journal or once a compaction replaced the snapshot."""
+        if not self._journal or self._snapshot_id is None:
+            return None
+        if _file_id(self.path) != self._snapshot_id:
+            return None
+        ops, offset = self._read_journal(self._journal_offset)
+        if _file_id(self.path) != self._snapshot_id:
+            return None  # compacted while reading: the journal was emptied
+        self._journal_entries += len(ops)
+        self._journal_offset = offset
+        return ops
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Stream the snapshot, merging journal entries record by record.
+
+        Only the journal (bounded by compaction) is held in memory; with a
+        streaming codec such as jsonl the snapshot is never loaded whole.
+        """
+        while True:
+            try:
+                f = open(self.path, "r" + self._mode)
+            except FileNotFoundError:
+                return
+            pending: Dict[int, List[Dict[str, Any]]] = {}
+            for op in self._read_journal()[0] if self._journal else []:
+                record_id = op["record"]["id"] if op["op"] == "create" else op["id"]
+                pending.setdefault(record_id, []).append(op)
+            # the journal belongs to the open snapshot unless a compaction
+            # renamed a new one over it meanwhile
+            if _file_id(self.path) == _file_id_of(f):
+                break
+            f.close()
+
+        with f:
+            for record in self._codec.iter(f):
+                ops = pending.pop(record["id"], None)
+                if not ops:
+                    yield record
+                    continue
+                merged = {record["id"]: record}
+                for op in ops:
+                    apply_op(merged, op)
+                yield from merged.values()
+
+        for ops in pending.values():
+            created: Records = {}
+            for op in ops:
+                apply_op(created, op)
+            yield from created.values()
+
+    def persist(
+        self,
+        records: Records,
+        ops: List[Dict[str, Any]],
+        sync: bool = False,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        for name, value in (meta or {}).items():
+            self.write_meta(name, value)
+        if not self._journal:
+            self._save_records(records.values(), sync)
+            return
+        entry = ops[0] if len(ops) == 1 else {"op": "batch", "ops": ops}
+        with open(self.journal_path, "ab") as f:
+            # records hold every entry read so far: skip ours when reading on
+            current = os.fstat(f.fileno()).st_size == self._journal_offset
+            f.write(json.dumps(entry).encode() + b"\n")
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+            if current:
+                self._journal_offset = f.tell()
+        self._journal_entries += len(ops)
+        if (
+            self._compact_threshold is not None
+            and self._journal_entries >= self._compact_threshold
+        ):
+            self.compact(records)
+
+    def compact(self, records: Records) -> None:
+        """Fold the journal into the snapshot file and truncate the journal."""
+        self._save_records(records.values())
+        if self._journal:
+            # A crash before this truncation is harmless: replay is idempotent.
+            open(self.journal_path, "w").close()
+        self._journal_entries = 0
+        self._snapshot_id, self._journal_offset = _file_id(self.path), 0
+
+    def _save_records(
+        self, records: Iterable[Dict[str, Any]], sync: bool = False
+    ) -> None:
+        replace_file(
+            self.path, lambda f: self._codec.dump(records, f), "w" + self._mode, sync
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"FileBackend(path='{self.path}', format='{self._codec.name}', "
+            f"journal={self._journal})"
+        )
+
+
+class SqliteBackend(StorageBackend):
+    transactional_meta = True
+
+    def __init__(self, path: str, indexed_fields: Iterable[str] = ()) -> None:
+        """SQLite file with one row per record and an index per field.
+        Args:
+            path: Database file path
+            indexed_fields: Top level record keys to index
+        """
+        super().__init__()
+        self.path = path
+        self._indexed_fields = set(indexed_fields)
+        # DataBase serializes writers, so the connection may be shared by threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records "
+                "(id INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            for field in self._indexed_fields:
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{field}" '
+                    f"ON records (json_extract(data, '$.{field}'))"
+                )
+
+    def token(self) -> int:
+        # data_version only moves when another connection commits
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self) -> Records:
+        rows = self._conn.execute("SELECT id, data FROM records ORDER BY id")
+        return {record_id: json.loads(data) for record_id, data in rows}
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        for (data,) in self._conn.execute("SELECT data FROM records ORDER BY id"):
+            yield json.loads(data)
+
+    def read_page(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT data FROM records WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit),
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def find(self, field: str, value: Any) -> Optional[List[Dict[str, Any]]]:
+        if field not in self._indexed_fields or not isinstance(
+            value, (str, int, float, type(None))
+        ):
+            return None  # no index, or a JSON object/array SQL can't compare
+        # the expression must match the index's to be served by it; IS also
+        # matches NULL (missing fields), like the in-memory index
+        rows = self._conn.execute(
+            f"SELECT data FROM records WHERE json_extract(data, '$.{field}') IS ? "
+            "ORDER BY id",
+            (value,),
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def persist(
+        self,
+        records: Records,
+        ops: List[Dict[str, Any]],
+        sync: bool = False,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        # one SQLite transaction, durable on commit whatever sync says
+        with self._conn:
+            for name, value in (meta or {}).items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    (name, json.dumps(value)),
+                )
+            for op in ops:
+                if op["op"] == "delete":
+                    self._conn.execute("DELETE FROM records WHERE id = ?", (op["id"],))
+                    continue
+                record_id = op["record"]["id"] if op["op"] == "create" else op["id"]
+                if record_id not in records:
+                    continue  # deleted again later in the same batch
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO records (id, data) VALUES (?, ?)",
+                    (record_id, json.dumps(records[record_id])),
+                )
+
+    def compact(self, records: Records) -> None:
+        self._conn.execute("VACUUM")
+
+    def read_meta(self, name: str) -> Any:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE name = ?", (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_meta(self, name: str, value: Any) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                (name, json.dumps(value)),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __repr__(self) -> str:
+        return f"SqliteBackend(path='{self.path}')"
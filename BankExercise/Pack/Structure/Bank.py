@@ -3,51 +3,86 @@ from typing import Any
 
 
 class MetaBank(type):
+    """Interns instances: calling the class with equal arguments returns the
+    one shared (and therefore immutable) object kept in the class registry."""
+
     def __new__(cls, name: str, bases: tuple[type, ...], attrs: dict[str, Any]):
+        attrs["_registry"] = {}
         return super().__new__(cls, name, bases, attrs)
 
+    def __call__(cls, *args: Any, **kwargs: Any):
+        key = cls._intern_key(*args, **kwargs)
+        instance = cls._registry.get(key)
+        if instance is None:
+            instance = super().__call__(*args, **kwargs)
+            cls._registry[key] = instance
+        return instance
+
 
 class Bank(metaclass=MetaBank):
+    __slots__ = ("__location", "__id", "__name")
+
     def __init__(self, name: str, location: str, id_code: int | str) -> None:
         self.__location = location
         self.__id = id_code
         self.__name = name
 
+    @staticmethod
+    def _intern_key(name: str, location: str, id_code: int | str) -> tuple:
+        return (name, location, f"{id_code}")
+
     def get_id_code(self) -> str:
         return f"Bank Id: {self.__id}"
 
     def set_id_code(self, id_code: str | int) -> None:
-        self.__id = f"{id_code}"
+        raise AttributeError("Bank instances are shared and cannot be changed")
 
     def get_location(self) -> str:
         return f"Bank place: {self.__location}"
 
     def set_location(self, location: str) -> None:
-        self.__location = location
+        raise AttributeError("Bank instances are shared and cannot be changed")
 
     def get_name(self) -> str:
         return f"Bank name: {self.__name}"
 
     def set_name(self, name: str) -> None:
-        self.__name = name
+        raise AttributeError("Bank instances are shared and cannot be changed")
+
+    def to_dict(self) -> dict[str, str]:
+        return {"name": self.__name, "location": self.__location, "id_code": f"{self.__id}"}
 
     def __str__(self) -> str:
         return f"Bank info: {self.__name}, {self.__id}, {self.__location}"
 
 
-class AccountType:
+class AccountType(metaclass=MetaBank):
+    __slots__ = ("__account",)
+
+    ACCOUNT_TYPES = {
+        1: "Savings Account",
+        2: "Current Account",
+        3: "Special Account",
+    }
+
     def __init__(self, account_choice: int | None) -> None:
-        self.__account_type = {
-            1: "Savings Account",
-            2: "Current Account",
-            3: "Special Account",
-        }
-
-        if (account_choice is not None) and (account_choice in self.__account_type):
-            self.__account = self.__account_type[account_choice]
+        if (account_choice is not None) and (account_choice in self.ACCOUNT_TYPES):
+            self.__account = self.ACCOUNT_TYPES[account_choice]
         else:
             raise Error("Error chosing the account type")
 
+    @staticmethod
+    def _intern_key(account_choice: int | None) -> int | None:
+        return account_choice
+
+    @classmethod
+    def from_name(cls, name: str) -> "AccountType | str":
+        """Shared AccountType for a stored name, or the name itself if unknown."""
+        for choice, account in cls.ACCOUNT_TYPES.items():
+            if account == name:
+                return cls(choice)
+        return name
+
     def get_account_type(self):
         return f"{self.__account}"
 
@@ -60,6 +95,8 @@ class AccountType:
 
 
 class BankAccount:
+    __slots__ = ("__account_type", "__bank_holder", "__level", "__balance")
+
     def __init__(
         self,
         account_type: AccountType,
@@ -73,7 +110,7 @@ class BankAccount:
         self.__balance = balance
 
     def get_account_type(self) -> AccountType:
-        return self.__account_type if not isinstance(self.__account_type, str)
+        return self.__account_type
 
     def set_account_type(self, account: AccountType) -> None:
         self.__account_type = account
@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from typing import IO, Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from Pack.Structure.Backend import replace_file
+from Pack.Structure.Versions import Changes
+
+Event = Dict[str, Any]
+_SCAN_BYTES = 64 * 1024  # below this, read the lines instead of bisecting
+
+
+class ChangeFeed:
+    def __init__(self, path: str) -> None:
+        """Ordered stream of the inserts, updates and deletes committed to a
+        database, one JSON line per changed record:
+
+            {"seq": 7, "ts": 1700000000.0, "op": "update", "id": 3, "record": {...}}
+
+        seq grows by one per event; "record" is the record after the
+        change (null for a delete). A consumer keeps the seq of the last
+        event it applied as its checkpoint and resumes after it, so keeping
+        another store in sync costs the number of changes, not the size of
+        the database. The file can be tailed by other processes without
+        opening the database.
+
+        Events are written before the data they describe, then settled by
+        a marker line, {"seq": 9, "commit": 7} or {"seq": 9, "abort": 7}
+        for the events 7 to 9, so no crash can leave stored data without
+        its events. Readers only see committed events; a batch a crashed
+        writer left unsettled is settled by the next one (see recover()).
+        Args:
+            path: Feed file (<file>.changes.jsonl next to the data)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._seq = 0  # newest sequence number written, settled or not
+        self._settled = 0  # newest sequence number committed or aborted
+        self._unsettled: List[Event] = []  # events waiting for their marker
+        self._stat: Optional[tuple] = None  # file the cached state was read from
+
+    def _stat_key(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino, st.st_size
+
+    def _read_end(self) -> None:
+        """Read the sequence numbers and the unsettled events from the end
+        of the file, if another writer changed it."""
+        key = self._stat_key()
+        if key == self._stat:
+            return
+        seq = settled = 0
+        unsettled: List[Event] = []
+        if key is not None:
+            with open(self.path, "rb") as f:
+                seq = settled = self._start(f)
+                for entry in _since_last_marker(f, key[2]):
+                    seq = max(seq, entry["seq"])
+                    if _is_marker(entry):
+                        settled, unsettled = entry["seq"], []
+                    else:
+                        unsettled.append(entry)
+        self._seq, self._settled, self._unsettled = seq, settled, unsettled
+        self._stat = key
+
+    def last_seq(self) -> int:
+        """Sequence number of the newest settled event (0 if there is none):
+        a checkpoint past every event committed so far."""
+        with self._lock:
+            self._read_end()
+            return self._settled
+
+    def append(self, commits: List[Changes], sync: bool = False) -> int:
+        """Log the records changed by staged transactions, in commit order,
+        before their data is persisted; commit() or abort() settles them.
+        The caller holds the writer lock.
+        Returns:
+            Sequence number of the last event
+        """
+        with self._lock:
+            self._read_end()
+            seq = self._seq
+            now = time.time()
+            events = []
+            for changes in commits:
+                for record_id, old, new in changes:
+                    if old is None and new is None:
+                        continue  # created and deleted by the same commit
+                    seq += 1
+                    if old is None:
+                        op = "insert"
+                    else:
+                        op = "delete" if new is None else "update"
+                    events.append(
+                        {
+                            "seq": seq,
+                            "ts": now,
+                            "op": op,
+                            "id": record_id,
+                            "record": new,
+                        }
+                    )
+            if not events:
+                return seq
+            self._write(events, sync)
+            self._seq = seq
+            self._unsettled = self._unsettled + events
+            return seq
+
+    def commit(self) -> None:
+        """Mark the appended events committed: their data was written.
+        The marker is not synced, a lost one is restored by recover()."""
+        self._settle("commit")
+
+    def abort(self) -> None:
+        """Withdraw the appended events: their data could not be written."""
+        self._settle("abort")
+
+    def recover(self, records: Mapping[int, Dict[str, Any]]) -> None:
+        """Settle the events a crashed writer logged but never marked:
+        committed if the records hold what they describe, else aborted.
+        The caller holds the writer lock.
+        Args:
+            records: Current records, before any new change is staged
+        """
+        with self._lock:
+            self._read_end()
+            final = {event["id"]: event["record"] for event in self._unsettled}
+        if final:
+            stored = all(records.get(i) == record for i, record in final.items())
+            self._settle("commit" if stored else "abort")
+
+    def _settle(self, kind: str) -> None:
+        with self._lock:
+            if not self._unsettled:
+                return
+            first, last = self._unsettled[0]["seq"], self._unsettled[-1]["seq"]
+            self._write([{"seq": last, kind: first}])
+            self._settled, self._unsettled = last, []
+
+    def _write(self, entries: List[Dict[str, Any]], sync: bool = False) -> None:
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._stat = self._stat_key()
+
+    def _start(self, f: IO[bytes]) -> int:
+        """Events up to this sequence number were trimmed from the file."""
+        f.seek(0)
+        first = f.readline()
+        if not first.endswith(b"\n"):
+            return 0
+        return json.loads(first).get("start", 0)
+
+    def _offset_after(self, f: IO[bytes], since: int) -> int:
+        """Offset of the first event after since, found by bisecting the
+        file (events are written in sequence order).
+        Raises:
+            ValueError: If events after since were already trimmed
+        """
+        if since < self._start(f):
+            raise ValueError(
+                f"Checkpoint {since} is older than the change feed, "
+                "copy the whole database again"
+            )
+        f.seek(0, os.SEEK_END)
+        lo, hi = 0, f.tell()  # every event before lo has seq <= since
+        while hi - lo > _SCAN_BYTES:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()  # skip to the next line start
+            pos = f.tell()
+            line = f.readline()
+            if line.endswith(b"\n") and json.loads(line).get("seq", 0) <= since:
+                lo = pos + len(line)
+            else:
+                hi = mid
+        f.seek(lo)
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line.endswith(b"\n") or json.loads(line).get("seq", 0) > since:
+                return pos
+
+    def read(self, since: int = 0) -> Iterator[Event]:
+        """Yield the events after the since checkpoint, oldest first.
+        Raises:
+            ValueError: If events after since were already trimmed
+        """
+        return self.tail(since, follow=False)
+
+    def tail(
+        self,
+        since: int = 0,
+        follow: bool = True,
+        poll_interval: float = 0.2,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[Event]:
+        """Yield the committed events after the since checkpoint and, with
+        follow, keep waiting for new ones. The events of a batch are held
+        back until its marker shows the data was written.
+        Args:
+            since: Sequence number of the last event already applied
+            follow: Keep polling the file once the end is reached
+            poll_interval: Seconds between polls
+            stop: Called between polls, ends the generator when true
+        Raises:
+            ValueError: If events after since were already trimmed
+        """
+        f: Optional[IO[bytes]] = None
+        batch: List[Event] = []  # events read, waiting for their marker
+        try:
+            while True:
+                if f is not None and _file_id(self.path) != _file_id_of(f):
+                    f.close()  # trimmed: find our place in the new file
+                    f = None
+                if f is None:
+                    try:
+                        f = open(self.path, "rb")
+                    except FileNotFoundError:
+                        f = None
+                    else:
+                        f.seek(self._offset_after(f, since))
+                        batch = []
+                if f is not None:
+                    while True:
+                        pos = f.tell()
+                        line = f.readline()
+                        if not line.endswith(b"\n"):
+                            f.seek(pos)  # still being written
+                            break
+                        entry = json.loads(line)
+                        if not _is_marker(entry):
+                            batch.append(entry)
+                            continue
+                        if "commit" in entry:
+                            first = max(entry["commit"], since + 1)
+                            for event in batch:
+                                if event["seq"] >= first:
+                                    since = event["seq"]
+                                    yield event
+                        batch = []
+                if not follow or (stop is not None and stop()):
+                    return
+                time.sleep(poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+    def trim(self, through: int) -> int:
+        """Drop the events up to a sequence number every consumer has
+        applied. The caller holds the writer lock.
+        Returns:
+            Number of events dropped
+        """
+        with self._lock:
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                return 0
+            with f:
+                start = self._start(f)
+                self._read_end()
+                through = min(max(through, start), self._settled)
+                f.seek(self._offset_after(f, through))
+                kept = [line for line in f if line.endswith(b"\n")]
+            replace_file(
+                self.path,
+                lambda out: out.write(
+                    json.dumps({"start": through}).encode() + b"\n" + b"".join(kept)
+                ),
+                mode="wb",
+            )
+            self._stat = None
+            return through - start
+
+    def __repr__(self) -> str:
+        return f"ChangeFeed(path='{self.path}')"
+
+
+def _is_marker(entry: Dict[str, Any]) -> bool:
+    return "commit" in entry or "abort" in entry
+
+
+def _since_last_marker(f: IO[bytes], size: int) -> List[Event]:
+    """Entries of the file from its last marker on (all of them if it has
+    none), read from the end one growing block at a time."""
+    block = 4096
+    while True:
+        f.seek(max(size - block, 0))
+        data = f.read(size - f.tell())
+        lines = data.split(b"\n")[:-1]  # drop the unterminated tail
+        if block < size:
+            lines = lines[1:]  # may start mid-line
+        entries = [json.loads(line) for line in lines if b'"seq"' in line]
+        for i in range(len(entries) - 1, -1, -1):
+            if _is_marker(entries[i]):
+                return entries[i:]
+        if block >= size:
+            return entries
+        block *= 2
+
+
+def _file_id(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _file_id_of(f: IO[bytes]) -> tuple:
+    st = os.fstat(f.fileno())
+    return st.st_dev, st.st_ino
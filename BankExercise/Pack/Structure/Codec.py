@@ -0,0 +1,219 @@
+import json
+import struct
+from collections import Counter
+from typing import IO, Any, Dict, Iterable, Iterator, List
+
+
+class JsonCodec:
+    """Indented JSON array, the original DataBase file format."""
+
+    name = "json"
+    extension = ".json"
+    binary = False
+
+    def dump(self, records: Iterable[Dict[str, Any]], f: IO) -> None:
+        json.dump(list(records), f, indent=4)
+
+    def load(self, f: IO) -> List[Dict[str, Any]]:
+        return json.load(f)
+
+    def iter(self, f: IO) -> Iterator[Dict[str, Any]]:
+        """An array can only be parsed whole, so this is not streaming."""
+        return iter(self.load(f))
+
+
+class JsonLinesCodec:
+    """One JSON record per line, readable one record at a time."""
+
+    name = "jsonl"
+    extension = ".jsonl"
+    binary = False
+
+    def dump(self, records: Iterable[Dict[str, Any]], f: IO) -> None:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+    def load(self, f: IO) -> List[Dict[str, Any]]:
+        return list(self.iter(f))
+
+    def iter(self, f: IO) -> Iterator[Dict[str, Any]]:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+# value tags
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _REF, _DICT, _LIST = range(9)
+
+
+class BinaryCodec:
+    """Length-prefixed, struct-packed records sharing one string table.
+
+    Layout: magic, u32 string count, the strings (u32 length + utf-8), then
+    each record as u32 length + tagged payload. Strings used more than once
+    (field names, account types, banks...) are stored once in the table
+    and referenced by index; numbers are packed as int64/float64.
+    """
+
+    name = "binary"
+    extension = ".bin"
+    binary = True
+    MAGIC = b"BKDB\x01"
+
+    def dump(self, records: Iterable[Dict[str, Any]], f: IO) -> None:
+        records = list(records)
+        counts: Counter = Counter()
+        for record in records:
+            self._count_strings(record, counts)
+        table = [text for text, count in counts.items() if count > 1]
+        refs = {text: i for i, text in enumerate(table)}
+
+        out = bytearray(self.MAGIC)
+        out += _U32.pack(len(table))
+        for text in table:
+            data = text.encode()
+            out += _U32.pack(len(data))
+            out += data
+        f.write(out)
+
+        for record in records:
+            payload = bytearray()
+            self._encode(record, refs, payload)
+            f.write(_U32.pack(len(payload)) + payload)
+
+    def load(self, f: IO) -> List[Dict[str, Any]]:
+        return list(self.iter(f))
+
+    def iter(self, f: IO) -> Iterator[Dict[str, Any]]:
+        """Yield records one at a time, stopping at a truncated last record.
+        Raises:
+            ValueError: If the file is not in this format
+        """
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            raise ValueError("Not a binary DataBase file")
+        (count,) = _U32.unpack(f.read(4))
+        table = []
+        for _ in range(count):
+            (size,) = _U32.unpack(f.read(4))
+            table.append(f.read(size).decode())
+
+        while True:
+            prefix = f.read(4)
+            if len(prefix) < 4:
+                return
+            (size,) = _U32.unpack(prefix)
+            payload = f.read(size)
+            if len(payload) < size:
+                return
+            yield self._decode(payload, 0, table)[0]
+
+    def _count_strings(self, value: Any, counts: Counter) -> None:
+        if isinstance(value, str):
+            counts[value] += 1
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                counts[key] += 1
+                self._count_strings(item, counts)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self._count_strings(item, counts)
+
+    def _encode(self, value: Any, refs: Dict[str, int], out: bytearray) -> None:
+        kind = type(value)
+        if kind is str:
+            ref = refs.get(value)
+            if ref is not None:
+                out.append(_REF)
+                out += _U32.pack(ref)
+            else:
+                data = value.encode()
+                out.append(_STR)
+                out += _U32.pack(len(data))
+                out += data
+        elif kind is dict:
+            out.append(_DICT)
+            out += _U16.pack(len(value))
+            for key, item in value.items():
+                self._encode(key, refs, out)
+                self._encode(item, refs, out)
+        elif value is None:
+            out.append(_NONE)
+        elif kind is bool:
+            out.append(_TRUE if value else _FALSE)
+        elif kind is int:
+            out.append(_INT)
+            out += _I64.pack(value)
+        elif kind is float:
+            out.append(_FLOAT)
+            out += _F64.pack(value)
+        elif kind is list or kind is tuple:
+            out.append(_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self._encode(item, refs, out)
+        else:
+            raise TypeError(f"Cannot encode {kind.__name__} values")
+
+    def _decode(self, data: bytes, pos: int, table: List[str]) -> tuple:
+        """Decode the value at pos, returning it with the next position."""
+        tag = data[pos]
+        pos += 1
+        if tag == _REF:
+            return table[_U32.unpack_from(data, pos)[0]], pos + 4
+        if tag == _STR:
+            (size,) = _U32.unpack_from(data, pos)
+            pos += 4
+            return data[pos : pos + size].decode(), pos + size
+        if tag == _DICT:
+            (count,) = _U16.unpack_from(data, pos)
+            pos += 2
+            result = {}
+            decode = self._decode
+            for _ in range(count):
+                if data[pos] == _REF:  # keys almost always come from the table
+                    key = table[_U32.unpack_from(data, pos + 1)[0]]
+                    pos += 5
+                else:
+                    key, pos = decode(data, pos, table)
+                result[key], pos = decode(data, pos, table)
+            return result, pos
+        if tag == _INT:
+            return _I64.unpack_from(data, pos)[0], pos + 8
+        if tag == _FLOAT:
+            return _F64.unpack_from(data, pos)[0], pos + 8
+        if tag == _NONE:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _LIST:
+            (count,) = _U32.unpack_from(data, pos)
+            pos += 4
+            items = []
+            for _ in range(count):
+                item, pos = self._decode(data, pos, table)
+                items.append(item)
+            return items, pos
+        raise ValueError(f"Unknown value tag {tag}")
+
+
+CODECS = {
+    codec.name: codec for codec in (JsonCodec(), JsonLinesCodec(), BinaryCodec())
+}
+
+
+def get_codec(name: str):
+    """Look up a codec by its format name.
+    Raises:
+        ValueError: If the format is unknown
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown format {name!r}") from None
@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import hmac
+import os
+from typing import Optional
+
+# work factor of each algorithm: PBKDF2 iterations, scrypt log2(N)
+ALGORITHMS = ("pbkdf2_sha256", "scrypt")
+DEFAULT_WORK_FACTOR = {"pbkdf2_sha256": 600_000, "scrypt": 14}
+SALT_BYTES = 16
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _derive(algorithm: str, work_factor: int, password: str, salt: bytes) -> bytes:
+    if algorithm == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, work_factor)
+    if algorithm == "scrypt":
+        n = 2**work_factor
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=_SCRYPT_R,
+            p=_SCRYPT_P,
+            maxmem=256 * n * _SCRYPT_R,
+            dklen=32,
+        )
+    raise ValueError(f"Unknown hashing algorithm {algorithm!r}")
+
+
+def hash_password(
+    password: str,
+    algorithm: str = "pbkdf2_sha256",
+    work_factor: Optional[int] = None,
+) -> str:
+    """Salted key derivation of a password.
+    Args:
+        password: Plaintext password
+        algorithm: "pbkdf2_sha256" or "scrypt"
+        work_factor: PBKDF2 iterations or scrypt log2(N) (default
+            DEFAULT_WORK_FACTOR)
+    Returns:
+        "<algorithm>$<work factor>$<salt>$<hash>", salt and hash in base64
+    Raises:
+        ValueError: If the algorithm is unknown
+    """
+    if work_factor is None:
+        work_factor = DEFAULT_WORK_FACTOR.get(algorithm, 0)
+    salt = os.urandom(SALT_BYTES)
+    digest = _derive(algorithm, work_factor, password, salt)
+    return f"{algorithm}${work_factor}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored: str) -> bool:
+    """Whether a stored password is a hash_password string (not plaintext)."""
+    return isinstance(stored, str) and stored.split("$", 1)[0] in ALGORITHMS
+
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    """Check a password against a stored hash, or against a legacy
+    plaintext password, in constant time."""
+    if stored is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        algorithm, work_factor, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _derive(algorithm, int(work_factor), password, base64.b64decode(salt))
+    except ValueError:  # malformed hash
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(
+    stored: Optional[str], algorithm: str, work_factor: Optional[int] = None
+) -> bool:
+    """Whether a stored password is plaintext or uses other parameters."""
+    if stored is None or not is_hashed(stored):
+        return True
+    if work_factor is None:
+        work_factor = DEFAULT_WORK_FACTOR.get(algorithm, 0)
+    return stored.split("$", 2)[:2] != [algorithm, str(work_factor)]
@@ -0,0 +1,50 @@
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List
+
+if TYPE_CHECKING:
+    from Pack.Structure.DataBase import DataBase
+
+
+class Cursor:
+    def __init__(self, db: "DataBase", after_id: int = 0, page_size: int = 100) -> None:
+        """Position in a DataBase listing, remembered as the last id read.
+
+        Records created or deleted between two pages never make the next
+        page skip or repeat a record, as an offset would. The position can
+        be stored (e.g. sent to a client) and given back as after_id to
+        resume.
+        Args:
+            db: Database to page through
+            after_id: Start after this id (0 = from the beginning)
+            page_size: Records per page
+        Raises:
+            ValueError: If page_size isn't positive
+        """
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        self._db = db
+        self.position = after_id
+        self.page_size = page_size
+        self.exhausted = False
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        """Next page (empty once the end is reached) and advance past it."""
+        page = self._db.read_page(self.position, self.page_size)
+        if page:
+            self.position = page[-1]["id"]
+        self.exhausted = len(page) < self.page_size
+        return page
+
+    def pages(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the remaining pages."""
+        while not self.exhausted:
+            page = self.fetch()
+            if page:
+                yield page
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yield the remaining records, one page read at a time."""
+        for page in self.pages():
+            yield from page
+
+    def __repr__(self) -> str:
+        return f"Cursor(position={self.position}, page_size={self.page_size})"
@@ -1,21 +1,121 @@
 import json
 import os
-from functools import cache
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from Pack.Structure.Aggregates import Aggregates
+from Pack.Structure.Backend import FileBackend, SqliteBackend, StorageBackend, apply_op
+from Pack.Structure.Bank import Bank
+from Pack.Structure.ChangeFeed import ChangeFeed, Event
+from Pack.Structure.Codec import get_codec
+from Pack.Structure.Credential import (
+    ALGORITHMS,
+    hash_password,
+    is_hashed,
+    needs_rehash,
+    verify_password,
+)
+from Pack.Structure.Cursor import Cursor
+from Pack.Structure.Index import HashIndex, IdIndex, TrigramIndex
+from Pack.Structure.LazyPerson import LazyPerson
 from Pack.Structure.Person import Person  # Ensure this import path is correct
+from Pack.Structure.Query import Where, run_query
+from Pack.Structure.QueryCache import QueryCache, cached_query
+from Pack.Structure.Transaction import Transaction
+from Pack.Structure.Versions import Changes, Snapshot, VersionStore
+
+if TYPE_CHECKING:
+    from Pack.Structure.PersonTable import PersonTable
 
 
 class DataBase:
-    def __init__(self, path: Optional[str] = None, file: str = "data.json"):
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        file: str = "data.json",
+        journal: bool = False,
+        compact_threshold: Optional[int] = 1000,
+        indexes: Optional[Dict[str, bool]] = None,
+        query_cache_size: int = 256,
+        backend: Union[str, StorageBackend] = "json",
+        format: str = "json",
+        group_commit_window: float = 0.002,
+        search_fields: Optional[List[str]] = None,
+        versions: bool = False,
+        version_retention: Optional[float] = None,
+        change_feed: bool = False,
+    ):
         """Initialize the database with optional path and filename.
         Args:
             path: Directory path (created if doesn't exist)
-            file: JSON filename
+            file: JSON filename (the extension follows the format/backend)
+            journal: Append mutations to a journal instead of rewriting the file
+            compact_threshold: Journal entries before an automatic compaction
+                (None disables it, compact() can still be called by hand)
+            indexes: Fields to index, mapped to whether values must be unique
+            query_cache_size: Query results kept in the LRU cache (0 disables)
+            backend: "json" (a single file), "sqlite" or a StorageBackend
+            format: File format of the json backend: "json", "jsonl" or "binary"
+            group_commit_window: Seconds a committing transaction waits for
+                others to share its write and fsync
+            search_fields: Fields covered by the fuzzy search() index
+            versions: Keep past versions of the records for point-in-time
+                reads (read_record_as_of(), snapshot())
+            version_retention: Seconds past versions stay readable before
+                they are garbage-collected (None keeps them all)
+            change_feed: Publish every committed insert, update and delete
+                to <file>.changes.jsonl (see changes())
+        Raises:
+            ValueError: If the backend name or format is unknown
         """
         self._file = os.path.join(path, file) if path and file else file
+        self._records: Optional[Dict[int, Dict[str, Any]]] = None
+        self._token: Any = None
+        self._cache_hits = 0
+        self._cache_reloads = 0
+        self._indexes = {
+            field: HashIndex(field, unique) for field, unique in (indexes or {}).items()
+        }
+        self._query_cache = QueryCache(query_cache_size)
+        self._search_index = TrigramIndex(search_fields) if search_fields else None
+        self._id_index = IdIndex()
+        self._aggregates = Aggregates(self._bank_code)
+        self._aggregates_token: Any = None  # backend token the totals match
+        self._banks: Optional[Dict[str, Bank]] = None
+        self._write_lock = threading.RLock()
+        self._queue_lock = threading.Condition()
+        self._commit_queue: List[Dict[str, Any]] = []
+        self._group_leader = False
+        self._group_commit_window = group_commit_window
         self._ensure_directory_exists()
-        self._setup_base()
+        self._backend = self._open_backend(backend, format, journal, compact_threshold)
+        self._file = self._backend.path
+        self._versions = (
+            VersionStore(
+                f"{os.path.splitext(self._file)[0]}.versions.jsonl",
+                version_retention,
+            )
+            if versions
+            else None
+        )
+        self._feed = (
+            ChangeFeed(f"{os.path.splitext(self._file)[0]}.changes.jsonl")
+            if change_feed
+            else None
+        )
 
     def _ensure_directory_exists(self):
         """Create parent directory if it doesn't exist."""
@@ -23,26 +123,41 @@ class DataBase:
         if dir_path and not os.path.exists(dir_path):
             os.makedirs(dir_path)
 
-    def _setup_base(self):
-        """Initialize JSON file with empty list if it doesn't exist."""
-        if not os.path.exists(self._file):
-            with open(self._file, "w") as f:
-                json.dump([], f)
+    def _open_backend(
+        self,
+        backend: Union[str, StorageBackend],
+        format: str,
+        journal: bool,
+        compact_threshold: Optional[int],
+    ) -> StorageBackend:
+        """Build the storage backend selected by name."""
+        if isinstance(backend, StorageBackend):
+            return backend
+        base = os.path.splitext(self._file)[0]
+        if backend == "json":
+            codec = get_codec(format)
+            return FileBackend(
+                base + codec.extension, codec, journal, compact_threshold
+            )
+        if backend == "sqlite":
+            return SqliteBackend(f"{base}.sqlite3", self._indexes)
+        raise ValueError(f"Unknown backend {backend!r}")
 
-    def _encoder(self, obj: Person) -> Dict[str, Any]:
+    def _encoder(self, obj: Union[Person, LazyPerson]) -> Dict[str, Any]:
         """Convert Person object to serializable dictionary.
         Args:
-            obj: Person instance
+            obj: Person instance (or LazyPerson)
         Returns:
             Dictionary representation
         Raises:
             TypeError: If obj isn't a Person
         """
 
-        if not isinstance(obj, Person):
+        if not isinstance(obj, (Person, LazyPerson)):
             raise TypeError("Object must be a Person instance")
 
         bankAccount = obj.get_bank_account()
+        bank = bankAccount.get_bank_holder() if bankAccount is not None else None
 
         return {
             "id": getattr(obj, "id", None),  # Handle missing ID
@@ -53,10 +168,10 @@ class DataBase:
             "mother": obj.get_mom(),
             "father": obj.get_dad(),
             "bank_account": {
-                "account_type": f"{bankAccount.get_account_type()}",
-                "bank_holder": f"{bankAccount.get_bank_holder()}",
-                "level": int(f"{bankAccount.get_level()}"),
-                "balance": float(f"{bankAccount.get_balance()}"),
+                "account_type": str(bankAccount.get_account_type()),
+                "bank": self._bank_ref(bank) if isinstance(bank, Bank) else None,
+                "level": int(bankAccount.get_level()),
+                "balance": float(bankAccount.get_balance()),
             }
             if bankAccount is not None
             else None,
@@ -69,48 +184,807 @@ class DataBase:
         Returns:
             Person instance
         """
-        person_data = self.read_record(index)
+        return self.read_person(index).to_person()
+
+    def read_person(self, record_id: int) -> LazyPerson:
+        """Get a record as a LazyPerson, which converts fields only when
+        they are read and builds the Person only when a setter is called.
+        Raises:
+            ValueError: If record not found
+        """
+        return LazyPerson(self.read_record(record_id), self._bank_of)
 
-        # Extract bank account data if it exists
-        bank_account_data = None
-        if person_data.get("bank_account"):
-            bank_account_data = {
-                "account_type": str(person_data["bank_account"]["account_type"]),
-                "bank_holder": str(person_data["bank_account"]["bank_holder"]),
-                "level": int(person_data["bank_account"]["level"]),
-                "balance": float(person_data["bank_account"]["balance"]),
+    def _bank_table(self) -> Dict[str, Bank]:
+        """Banks referenced by records, keyed by id code and shared by all
+        decoded accounts."""
+        if self._banks is None:
+            self._banks = {
+                code: Bank(**fields)
+                for code, fields in (self._backend.read_meta("banks") or {}).items()
             }
+        return self._banks
 
-        return Person(
-            full_name=str(person_data["full_name"]),
-            age=int(str(person_data["age"])),
-            cpf=str(person_data["cpf"]),
-            rg=str(person_data["rg"]),
-            mom=str(person_data["mother"]),
-            dad=str(person_data["father"]),
-            bank_account=bank_account_data,
-        )
+    def _bank_ref(self, bank: Bank) -> str:
+        """Register a bank in the table and return the reference to store."""
+        code = bank.to_dict()["id_code"]
+        if code not in self._bank_table():
+            with self._backend.lock():
+                self._banks = None  # merge with banks other processes added
+                banks = self._bank_table()
+                banks.setdefault(code, bank)
+                self._backend.write_meta(
+                    "banks", {c: b.to_dict() for c, b in banks.items()}
+                )
+        return code
+
+    def _bank_of(self, account: Dict[str, Any]) -> Optional[Bank]:
+        """Resolve a stored bank account's bank to the shared Bank object."""
+        code = account.get("bank")
+        if code is None and account.get("bank_holder", "None") != "None":
+            # records written before the bank table held "Bank info: name, id, place"
+            info = account["bank_holder"].split(": ", 1)[1]
+            name, code, location = info.rsplit(", ", 2)
+            if code not in self._bank_table():
+                self._bank_ref(Bank(name=name, location=location, id_code=code))
+        if code is None:
+            return None
+        if code not in self._bank_table():
+            self._banks = None  # another writer may have added it
+        return self._bank_table().get(code)
 
     def read_records(self) -> List[Dict[str, Any]]:
         """Read all records from JSON file.
         Returns:
-            List of records (empty list if file is empty/corrupt)
+            List of records (empty list if file is empty/corrupt). The records
+            are shared with the snapshot cache and must not be modified.
+        """
+        return list(self._load().values())
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield every record in id order.
+
+        Serves the snapshot cache when it is loaded and current; otherwise the
+        backend is streamed without filling the cache, so with the jsonl
+        format memory stays constant however many records there are.
+        """
+        if self._records is not None and self._backend.token() == self._token:
+            self._cache_hits += 1
+            yield from list(self._records.values())
+        else:
+            yield from self._backend.iter_records()
+
+    def _load(self) -> Dict[int, Dict[str, Any]]:
+        """Return records keyed by id.
+
+        The decoded snapshot is cached and kept up to date by every mutation
+        made through this instance. When the backend's token shows another
+        writer changed it, only the ops stored since are applied if the
+        backend can read them (a journal), else everything is read again.
+        """
+        token = self._backend.token()
+        if self._records is not None and token == self._token:
+            self._cache_hits += 1
+            return self._records
+        if self._records is not None and self._catch_up(token):
+            return self._records
+
+        records = self._backend.load()
+        self._records = records
+        self._token = token
+        self._cache_reloads += 1
+        self._on_reload(records)
+        return records
+
+    def _catch_up(self, token: Any) -> bool:
+        """Apply to the loaded records the ops other writers stored since
+        they were read, updating the derived structures record by record.
+        Returns:
+            False if the backend can't read just those ops
+        """
+        with self._write_lock:  # writers of this process stage in place
+            records = self._records
+            if records is None:
+                return False
+            if token == self._token:
+                return True
+            ops = self._backend.read_changes()
+            if ops is None:
+                return False
+            reorder = False
+            for op in ops:
+                record_id = op["record"]["id"] if op["op"] == "create" else op["id"]
+                old = records.get(record_id)
+                apply_op(records, op)
+                new = records.get(record_id)
+                if old is None and new is not None:
+                    reorder = reorder or record_id < self._id_index.last()
+                if old is not new:
+                    self._on_change(old, new)
+            if reorder:  # a re-inserted id went to the end, restore id order
+                ordered = sorted(records.items())
+                records.clear()
+                records.update(ordered)
+            if self._aggregates_token == self._token:
+                self._aggregates_token = token  # kept current by _on_change
+            self._token = token
+            return True
+
+    def _loaded(self) -> bool:
+        """Whether the cached records are loaded and current."""
+        return self._records is not None and self._backend.token() == self._token
+
+    def _derived_indexes(self) -> List[Union[HashIndex, TrigramIndex]]:
+        indexes: List[Union[HashIndex, TrigramIndex]] = list(self._indexes.values())
+        if self._search_index is not None:
+            indexes.append(self._search_index)
+        return indexes
+
+    def _on_reload(self, records: Dict[int, Dict[str, Any]]) -> None:
+        """Rebuild derived structures after the records were read from disk."""
+        self._query_cache.clear()
+        for index in self._derived_indexes():
+            index.rebuild(records.values())
+        self._id_index.rebuild(records.values())
+        if not self._read_aggregates(self._token):
+            self._rebuild_aggregates(records)
+
+    def _on_change(
+        self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]
+    ) -> None:
+        """Update derived structures for one record (None = absent)."""
+        self._query_cache.clear()
+        for index in self._derived_indexes():
+            if old is not None and new is not None and not index.changed(old, new):
+                continue  # e.g. a balance update leaves the name indexes alone
+            if old is not None:
+                index.remove(old)
+            if new is not None:
+                index.add(new)
+        if old is not None:
+            self._aggregates.remove(old)
+        if new is not None:
+            self._aggregates.add(new)
+        if old is None and new is not None:  # ids only change on create/delete
+            self._id_index.add(new)
+        elif new is None and old is not None:
+            self._id_index.remove(old)
+
+    def _bank_code(self, account: Dict[str, Any]) -> Optional[str]:
+        if account.get("bank") is not None:
+            return account["bank"]
+        bank = self._bank_of(account)  # legacy "bank_holder" text
+        return bank.to_dict()["id_code"] if bank is not None else None
+
+    def _read_aggregates(self, token: Any) -> bool:
+        """Load the saved totals if they match the data with this token."""
+        backend = self._backend
+        if not (backend.transactional_meta or backend.persistent_token):
+            return False
+        saved = backend.read_meta("aggregates")
+        if not isinstance(saved, dict):
+            return False
+        if backend.transactional_meta:
+            # committed with the records: current unless a commit came since
+            if backend.token() != token:
+                return False
+        elif saved.get("token") != _jsonable(token):
+            return False
+        try:
+            self._aggregates.load(saved.get("values"))
+        except ValueError:  # corrupt side file, rebuilt by the caller
+            return False
+        self._aggregates_token = token
+        return True
+
+    def _save_aggregates(self) -> None:
+        """Mark the totals current for the loaded records and save them
+        next to the data with the token they match (backends with
+        transactional_meta already saved them in persist()). Called after
+        a commit succeeded, so a failed save is not raised: the old side
+        file no longer matches the token and is rebuilt when read."""
+        self._aggregates_token = self._token
+        if self._backend.transactional_meta or not self._backend.persistent_token:
+            return
+        try:
+            self._backend.write_meta(
+                "aggregates",
+                {"token": _jsonable(self._token), "values": self._aggregates.to_dict()},
+            )
+        except OSError:
+            pass
+
+    def _rebuild_aggregates(self, records: Dict[int, Dict[str, Any]]) -> None:
+        """Compute the totals from the loaded records when the saved ones
+        are missing, corrupt or stale, and save them."""
+        self._aggregates.rebuild(records.values())
+        backend = self._backend
+        if not backend.transactional_meta:
+            self._save_aggregates()
+            return
+        self._aggregates_token = self._token
+        with backend.lock():
+            if backend.token() == self._token:  # nobody committed since the load
+                backend.write_meta("aggregates", self._saved_aggregates())
+
+    def _saved_aggregates(self) -> Dict[str, Any]:
+        return {"values": self._aggregates.to_dict()}
+
+    def _persist(
+        self,
+        records: Dict[int, Dict[str, Any]],
+        ops: List[Dict[str, Any]],
+        sync: bool = False,
+    ) -> None:
+        """Write staged ops, with the totals when the backend can store
+        them in the same transaction."""
+        meta = None
+        if self._backend.transactional_meta:
+            meta = {"aggregates": self._saved_aggregates()}
+        self._backend.persist(records, ops, sync=sync, meta=meta)
+
+    def aggregates(self) -> Dict[str, Any]:
+        """Totals kept up to date on every change, without reading records.
+
+        Served from memory while current, else from the copy saved with
+        the data (in the same transaction on SQLite) when it matches the
+        data's current state; only then are the records loaded and the
+        totals rebuilt.
+        Returns:
+            Dictionary with the number of records, balance and accounts per
+            bank id code, accounts per account type and per level
+        """
+        token = self._backend.token()
+        if token != self._aggregates_token and not self._read_aggregates(token):
+            self._load()
+            if self._aggregates_token != self._token:  # snapshot was cached
+                self._rebuild_aggregates(self._records)
+        return self._aggregates.to_dict()
+
+    def cache_info(self) -> Dict[str, int]:
+        """Snapshot and query cache counters.
+        Returns:
+            Dictionary with snapshot hits/reloads and query cache hits/misses/size
+        """
+        return {
+            "hits": self._cache_hits,
+            "reloads": self._cache_reloads,
+            **self._query_cache.info(),
+        }
+
+    def person_table(
+        self,
+        columns: Optional[List[str]] = None,
+        records: Optional[Iterable[Dict[str, Any]]] = None,
+    ) -> "PersonTable":
+        """Columnar copy of the records for analytics (requires NumPy).
+        Args:
+            columns: String columns to load (default all)
+            records: Records to load instead of iter_records()
+        """
+        from Pack.Structure.PersonTable import PersonTable
+
+        return PersonTable.from_records(
+            self.iter_records() if records is None else records,
+            self._bank_of,
+            columns,
+        )
+
+    @cached_query
+    def find_by(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        """Get every record whose field equals value.
+        Uses the field's index when one is declared (the store's own index
+        on SQLite while nothing is loaded), otherwise streams
+        iter_records(). Results are cached until the next mutation.
+        Args:
+            field: Top level record key
+            value: Value to match
+        Returns:
+            Matching records in id order
+        """
+        index = self._indexes.get(field)
+        if index is not None:
+            if not self._loaded():
+                found = self._backend.find(field, value)
+                if found is not None:
+                    return found
+            records = self._load()
+            return [records[i] for i in index.lookup(value)]
+        return [r for r in self.iter_records() if r.get(field) == value]
+
+    def query(
+        self,
+        where: Where = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select records without decoding them into Person objects.
+
+        Conditions are tested while the records stream by, and only the
+        requested fields are copied out. Equality conditions on indexed
+        fields read just the ids the smallest index holds.
+        Args:
+            where: {dotted field: value} equality conditions, or a callable
+                taking the stored record and returning a bool
+            fields: Dotted fields to return, e.g. ["id", "full_name",
+                "bank_account.balance"] (default the whole stored record,
+                which must not be modified)
+            limit: Stop after this many matches
+        Returns:
+            Matching records (or {field: value} dicts) in id order
+        """
+        return list(run_query(self._candidates(where), where, fields, limit))
+
+    def _candidates(self, where: Where) -> Iterable[Dict[str, Any]]:
+        """Records a where clause has to be tested on: those under the most
+        selective matching index (or under the store's index of the first
+        indexed field while nothing is loaded), otherwise all of them."""
+        indexed = (
+            [path for path in where if path in self._indexes]
+            if isinstance(where, Mapping)
+            else []
+        )
+        if not indexed:
+            return self.iter_records()
+        if not self._loaded():
+            found = self._backend.find(indexed[0], where[indexed[0]])
+            if found is not None:
+                return found
+        records = self._load()
+        ids = min(
+            (self._indexes[path].lookup(where[path]) for path in indexed), key=len
+        )
+        return [records[i] for i in sorted(ids)]
+
+    def read_page(self, after_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Records with an id above after_id, in id order.
+        Pages the loaded snapshot through the id index, or asks the backend
+        for just the page when nothing is loaded (SQLite), so the cost
+        follows the page size.
+        Args:
+            after_id: Last id of the previous page (0 for the first page)
+            limit: Maximum number of records
+        Returns:
+            Records, shared with the cache (must not be modified)
+        """
+        if not self._loaded():
+            page = self._backend.read_page(after_id, limit)
+            if page is not None:
+                return page
+        records = self._load()
+        return [records[i] for i in self._id_index.after(after_id, limit)]
+
+    def cursor(self, after_id: int = 0, page_size: int = 100) -> Cursor:
+        """Stable cursor over the records in id order (see Cursor)."""
+        return Cursor(self, after_id, page_size)
+
+    def search(self, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Fuzzy search of the search_fields: partial or misspelled words
+        still match ("jon silva" finds "João da Silva").
+        Args:
+            text: Words to look for, in any order
+            limit: Maximum number of records
+        Returns:
+            Best matching records first
+        Raises:
+            ValueError: If the database has no search_fields
+        """
+        if self._search_index is None:
+            raise ValueError("DataBase has no search_fields")
+        records = self._load()  # brings the index up to date
+        return [
+            records[record_id]
+            for record_id, _ in self._search_index.search(text, limit)
+        ]
+
+    def _version_store(self) -> VersionStore:
+        if self._versions is None:
+            raise ValueError("DataBase was opened without versions")
+        return self._versions
+
+    def _as_of(
+        self, seq: Optional[int], when: Optional[float]
+    ) -> Tuple[Dict[int, Dict[str, Any]], VersionStore, int]:
+        """Current records, the refreshed version store and the sequence
+        number to read at. The records are read first: versions are logged
+        before the data, so every change they show is in the store."""
+        records = self._load()
+        versions = self._version_store()
+        versions.refresh()
+        if seq is None:
+            seq = versions.seq if when is None else versions.seq_at(when)
+        versions.check(seq)
+        return records, versions, seq
+
+    def version_seq(self) -> int:
+        """Sequence number of the last commit."""
+        versions = self._version_store()
+        versions.refresh()
+        return versions.seq
+
+    def read_record_as_of(
+        self, record_id: int, seq: Optional[int] = None, when: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Get a record as it was after a commit or at a point in time.
+        Args:
+            record_id: Integer ID to search for
+            seq: Sequence number of the commit (default the latest)
+            when: Timestamp (time.time()) to read at instead of seq
+        Returns:
+            Record dictionary
+        Raises:
+            ValueError: If the record did not exist then, the versions were
+                garbage-collected or the database has no versions
+        """
+        records, versions, seq = self._as_of(seq, when)
+        logged, record = versions.version(record_id, seq)
+        if not logged:
+            record = records.get(record_id)
+        if record is None:
+            raise ValueError(f"Record with ID {record_id} not found at sequence {seq}")
+        return record
+
+    def read_records_as_of(
+        self, seq: Optional[int] = None, when: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Every record as it was after a commit or at a point in time, in
+        id order (see read_record_as_of())."""
+        records, versions, seq = self._as_of(seq, when)
+        return list(versions.as_of(records, seq).values())
+
+    def history(self, record_id: int) -> List[Dict[str, Any]]:
+        """Kept versions of a record, oldest first, as dictionaries with
+        the commit's "seq" and "ts" and the "record" (None once deleted).
+        A record that never changed since versions were enabled has none."""
+        versions = self._version_store()
+        versions.refresh()
+        return versions.history(record_id)
+
+    def snapshot(self) -> Snapshot:
+        """Consistent read-only view of the database as of now.
+
+        Only the sequence number is taken under the write lock: a long
+        report then reads the snapshot while writers keep committing.
+        Raises:
+            ValueError: If the database has no versions
+        """
+        versions = self._version_store()
+        with self._write_lock, self._backend.lock():
+            versions.refresh()
+            return Snapshot(self, versions.seq)
+
+    def gc_versions(self) -> int:
+        """Drop the versions older than version_retention now (otherwise
+        done every thousand or so changed records).
+        Returns:
+            Number of versions dropped
+        """
+        versions = self._version_store()
+        with self._write_lock, self._backend.lock():
+            return versions.gc(self._load())
+
+    def _next_id(self, records: Dict[int, Dict[str, Any]]) -> int:
+        """Id for a new record, after the highest id of the records (the
+        id index is kept in step with them by _on_change)."""
+        return self._id_index.last() + 1
+
+    def _stage(
+        self, records: Dict[int, Dict[str, Any]], ops: List[Dict[str, Any]]
+    ) -> Changes:
+        """Validate and apply ops to the loaded records (not yet persisted).
+
+        New records with id None get the next id. If any op fails, the ops
+        already applied are undone before the error is raised.
+        Returns:
+            (id, record before, record after) of every changed record
+        Raises:
+            ValueError: If a record is missing or a unique index is violated
+        """
+        undo = []
+        try:
+            for op in ops:
+                if op["op"] == "create":
+                    if op["record"]["id"] is None:
+                        op["record"]["id"] = self._next_id(records)
+                    record_id = op["record"]["id"]
+                    new = op["record"]
+                else:
+                    record_id = op["id"]
+                    if record_id not in records:
+                        raise ValueError(f"Record with ID {record_id} not found")
+                    new = (
+                        {**records[record_id], **op["data"]}
+                        if op["op"] == "update"
+                        else None
+                    )
+                if new is not None:
+                    for index in self._indexes.values():
+                        index.check(new)
+
+                old = records.get(record_id)
+                apply_op(records, op)
+                undo.append((record_id, old))
+                self._on_change(old, records.get(record_id))
+        except Exception:
+            self._unstage(records, undo)
+            raise
+        before: Dict[int, Optional[Dict[str, Any]]] = {}
+        for record_id, old in undo:
+            before.setdefault(record_id, old)
+        return [(i, old, records.get(i)) for i, old in before.items()]
+
+    def _unstage(
+        self,
+        records: Dict[int, Dict[str, Any]],
+        undo: List[Tuple[int, Optional[Dict[str, Any]]]],
+    ) -> None:
+        """Put back the records replaced by _stage, newest change first."""
+        restored = False
+        for record_id, old in reversed(undo):
+            current = records.get(record_id)
+            if old is None:
+                records.pop(record_id, None)
+            else:
+                # an existing key is replaced in place and keeps its position
+                restored = restored or current is None
+                records[record_id] = old
+            self._on_change(current, old)
+        if restored:  # a re-inserted key went to the end, restore id order
+            ordered = sorted(records.items())
+            records.clear()
+            records.update(ordered)
+
+    def _commit(self, ops: List[Dict[str, Any]]) -> None:
+        """Apply mutations to the loaded records and persist them in one write.
+        Raises:
+            ValueError: If a record is missing or a unique index is violated
+                (nothing is written)
+        """
+        with self._write_lock, self._backend.lock():
+            # another process may have written since our snapshot was loaded
+            records = self._load()
+            self._recover_changes(records)
+            commits = [self._stage(records, ops)]
+            seqs = []
+            try:
+                seqs = self._log_versions(commits)
+                self._log_changes(commits)
+                self._persist(records, ops)
+            except Exception:
+                self._records = None  # re-read whatever actually reached the store
+                self._aggregates_token = None  # the totals include the failed ops
+                self._abort_versions(seqs, commits)
+                self._abort_changes()
+                raise
+            self._token = self._backend.token()
+            self._save_aggregates()
+            self._publish()
+            self._collect_versions(records)
+
+    def _commit_group(
+        self,
+        ops: List[Dict[str, Any]],
+        reads: Optional[Mapping[int, Dict[str, Any]]] = None,
+    ) -> None:
+        """Commit a transaction, sharing the write and fsync with every other
+        transaction that arrives within the group commit window.
+
+        Each caller queues its ops; if no group is being written it becomes
+        the leader, waits for the window, then stages and persists the whole
+        queue as a single batch. The others sleep until their ops are done.
+        Args:
+            ops: Staged ops of the transaction
+            reads: Records the transaction read, by id, as it read them
+        Raises:
+            ValueError: If this transaction's ops fail validation or one of
+                the records it read changed since
         """
+        request: Dict[str, Any] = {
+            "ops": ops,
+            "reads": reads or {},
+            "done": False,
+            "error": None,
+        }
+        with self._queue_lock:
+            self._commit_queue.append(request)
+            while self._group_leader and not request["done"]:
+                self._queue_lock.wait()
+            leader = not request["done"]
+            if leader:
+                self._group_leader = True
+
+        if leader:
+            if self._group_commit_window:
+                time.sleep(self._group_commit_window)
+            with self._queue_lock:
+                group, self._commit_queue = self._commit_queue, []
+            with self._write_lock, self._backend.lock():
+                self._commit_requests(group)
+            with self._queue_lock:
+                self._group_leader = False
+                self._queue_lock.notify_all()
+
+        if request["error"] is not None:
+            raise request["error"]
+
+    def _commit_requests(self, group: List[Dict[str, Any]]) -> None:
+        """Stage each queued transaction on its own, then persist the ones
+        that passed as one write-ahead record with one fsync."""
         try:
-            with open(self._file, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            records = self._load()
+            self._recover_changes(records)
+        except Exception as error:
+            for request in group:
+                request["error"], request["done"] = error, True
+            return
+        staged, commits = [], []
+        for request in group:
+            try:
+                self._check_reads(records, request["reads"])
+                commits.append(self._stage(records, request["ops"]))
+                staged.append(request)
+            except Exception as error:
+                request["error"] = error
+
+        ops = [op for request in staged for op in request["ops"]]
+        seqs = []
+        try:
+            if ops:
+                seqs = self._log_versions(commits)
+                self._log_changes(commits, sync=True)
+                self._persist(records, ops, sync=True)
+        except Exception as error:
+            self._records = None  # re-read whatever actually reached the store
+            self._aggregates_token = None  # the totals include the failed ops
+            self._abort_versions(seqs, commits)
+            self._abort_changes()
+            for request in staged:
+                request["error"] = error
+        else:
+            if ops:
+                self._token = self._backend.token()
+                self._save_aggregates()
+                self._publish()
+            self._collect_versions(records)
+        for request in group:
+            request["done"] = True
+
+    def _check_reads(
+        self, records: Dict[int, Dict[str, Any]], reads: Mapping[int, Dict[str, Any]]
+    ) -> None:
+        """Fail a transaction whose reads are stale: its ops were computed
+        from records another commit changed since.
+        Raises:
+            ValueError: If a record read changed or was deleted
+        """
+        for record_id, read in reads.items():
+            if records.get(record_id) != read:
+                raise ValueError(
+                    f"Record with ID {record_id} changed since it was read"
+                )
+
+    def _log_versions(self, commits: List[Changes]) -> List[int]:
+        """Log the versions written by each staged commit before the data
+        itself is persisted, so a reader never sees data without its
+        history. Returns the commits' sequence numbers."""
+        if self._versions is None:
             return []
+        return self._versions.append(commits)
 
-    @cache
-    def read_record_by_user(self, user: Person):
-        values = self.read_records()
+    def _abort_versions(self, seqs: List[int], commits: List[Changes]) -> None:
+        if self._versions is not None and seqs:
+            self._versions.abort(seqs, commits)
 
-        for i in range(len(values)):
-            if user.get_full_name() == values[i]["full_name"]:
-                print(f"user id is: {values[i]['id']}")
-                return [True, values[i]]
-        return [False, values]
+    def _recover_changes(self, records: Dict[int, Dict[str, Any]]) -> None:
+        """Settle the change events a crashed writer left unmarked, against
+        the records just loaded and before anything new is staged."""
+        if self._feed is not None:
+            self._feed.recover(records)
+
+    def _log_changes(self, commits: List[Changes], sync: bool = False) -> None:
+        """Log the change events of staged commits before their data is
+        persisted, still under the writer locks so events keep the commit
+        order; _publish() or _abort_changes() settles them."""
+        if self._feed is not None:
+            self._feed.append(commits, sync)
+
+    def _abort_changes(self) -> None:
+        if self._feed is None:
+            return
+        try:
+            self._feed.abort()
+        except OSError:
+            pass  # left unsettled, the next writer aborts them in recover()
+
+    def _publish(self) -> None:
+        """Mark the logged change events committed. The data is already
+        stored, so a failure here is not raised: the next writer finds the
+        events unmarked and commits them in recover()."""
+        if self._feed is None:
+            return
+        try:
+            self._feed.commit()
+        except OSError:
+            pass
+
+    def _collect_versions(self, records: Dict[int, Dict[str, Any]]) -> None:
+        """Garbage-collect old versions every so many commits; the commit
+        already succeeded, so a failed collection is simply tried again later."""
+        if self._versions is not None and self._versions.due_for_gc():
+            try:
+                self._versions.gc(records)
+            except (OSError, ValueError):
+                pass
+
+    def _change_feed(self) -> ChangeFeed:
+        if self._feed is None:
+            raise ValueError("DataBase was opened without change_feed")
+        return self._feed
+
+    def change_seq(self) -> int:
+        """Sequence number of the last published change (a checkpoint
+        that skips everything committed so far)."""
+        return self._change_feed().last_seq()
+
+    def changes(
+        self,
+        since: int = 0,
+        follow: bool = False,
+        poll_interval: float = 0.2,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[Event]:
+        """Yield the inserts, updates and deletes committed after a
+        checkpoint, in commit order.
+
+        Each event is {"seq", "ts", "op", "id", "record"}; store the seq of
+        the last one applied and pass it back as since to resume.
+        Args:
+            since: Checkpoint (0 = from the oldest kept event)
+            follow: Keep waiting for new changes instead of stopping
+            poll_interval: Seconds between polls while following
+            stop: Called between polls, ends the stream when true
+        Raises:
+            ValueError: If the changes after since were trimmed or the
+                database has no change feed
+        """
+        return self._change_feed().tail(since, follow, poll_interval, stop)
+
+    def trim_changes(self, through: int) -> int:
+        """Drop the published changes up to a checkpoint every consumer
+        has passed.
+        Returns:
+            Number of events dropped
+        """
+        feed = self._change_feed()
+        with self._write_lock, self._backend.lock():
+            return feed.trim(through)
+
+    def transaction(self) -> Transaction:
+        """Stage several mutations and commit them atomically.
+
+        Usage:
+            with db.transaction() as tx:
+                tx.update_record(1, {...})
+                tx.update_record(2, {...})
+        """
+        return Transaction(self)
+
+    def compact(self) -> None:
+        """Fold the journal into the snapshot (or vacuum the backend store)."""
+        with self._write_lock, self._backend.lock():
+            self._backend.compact(self._load())
+            self._token = self._backend.token()
+            self._save_aggregates()
+
+    def close(self) -> None:
+        """Release the backend's file handles."""
+        self._backend.close()
+
+    def read_record_by_user(self, user: Person):
+        matches = self.find_by("full_name", user.get_full_name())
+        if matches:
+            print(f"user id is: {matches[0]['id']}")
+            return [True, matches[0]]
+        return [False, self.read_records()]
 
     def read_record(self, record_id: int) -> Dict[str, Any]:
         """Get specific record by ID.
@@ -121,10 +995,9 @@ class DataBase:
         Raises:
             ValueError: If record not found
         """
-        records = self.read_records()
-        for record in records:
-            if record.get("id") == record_id:
-                return record
+        records = self._load()
+        if record_id in records:
+            return records[record_id]
         raise ValueError(f"Record with ID {record_id} not found")
 
     def create_record(self, new_record: Person) -> Dict[str, Any]:
@@ -134,16 +1007,30 @@ class DataBase:
         Returns:
             Created record with generated ID
         """
-        records = self.read_records()
         record_data = self._encoder(new_record)
+        record_data["id"] = None  # assigned when committed
 
-        # Generate sequential ID
-        record_data["id"] = max((r["id"] for r in records), default=0) + 1
-
-        records.append(record_data)
-        self._save_records(records)
+        self._commit([{"op": "create", "record": record_data}])
         return record_data
 
+    def create_records(self, new_records: Iterable[Person]) -> List[Dict[str, Any]]:
+        """Add many records with a single write.
+        Args:
+            new_records: Person instances to add
+        Returns:
+            Created records with generated IDs, in input order
+        Raises:
+            ValueError: If a record violates a unique index (none are added)
+        """
+        created = []
+        for person in new_records:
+            record_data = self._encoder(person)
+            record_data["id"] = None  # assigned when committed
+            created.append(record_data)
+
+        self._commit([{"op": "create", "record": r} for r in created])
+        return created
+
     def update_record(
         self, record_id: int, updated_data: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -156,21 +1043,26 @@ class DataBase:
         Raises:
             ValueError: If record not found
         """
-        records = self.read_records()
-        updated = False
-
-        for record in records:
-            if record.get("id") == record_id:
-                record.update(updated_data)
-                updated = True
-                break
-
-        if not updated:
-            raise ValueError(f"Record with ID {record_id} not found")
-
-        self._save_records(records)
+        self._commit([{"op": "update", "id": record_id, "data": updated_data}])
         return self.read_record(record_id)
 
+    def update_records(
+        self, updates: Mapping[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Update many records with a single write.
+        Args:
+            updates: Record ID mapped to the fields to update
+        Returns:
+            Updated records, in mapping order
+        Raises:
+            ValueError: If a record is not found (none are updated)
+        """
+        self._commit(
+            [{"op": "update", "id": i, "data": data} for i, data in updates.items()]
+        )
+        records = self._load()
+        return [records[record_id] for record_id in updates]
+
     def delete_record(self, record_id: int) -> bool:
         """Remove record by ID.
         Args:
@@ -180,33 +1072,131 @@ class DataBase:
         Raises:
             ValueError: If record not found
         """
-        records = self.read_records()
-        initial_count = len(records)
-        records = [r for r in records if r.get("id") != record_id]
-
-        if len(records) == initial_count:
-            raise ValueError(f"Record with ID {record_id} not found")
-
-        self._save_records(records)
+        self._commit([{"op": "delete", "id": record_id}])
         return True
 
-    def _save_records(self, records: List[Dict[str, Any]]):
-        """Internal method to save records to file."""
-        with open(self._file, "w") as f:
-            json.dump(records, f, indent=4)
-
     def __repr__(self) -> str:
         return f"DataBase(file='{self._file}')"
 
 
+def _jsonable(value: Any) -> Any:
+    """Value as it reads back from JSON (tuples become lists)."""
+    return json.loads(json.dumps(value))
+
+
+def migrate(source: DataBase, target: DataBase) -> int:
+    """Copy every record of source into target, keeping the ids.
+    Args:
+        source: Database to read from
+        target: Database to write into (records with the same id are replaced)
+    Returns:
+        Number of records copied
+    """
+    ops = [{"op": "create", "record": record} for record in source.read_records()]
+    _copy_banks(source, target)
+    _replay(target, ops)
+    return len(ops)
+
+
+def replicate(source: DataBase, target: DataBase, since: int = 0) -> int:
+    """Apply to target the changes published by source after a checkpoint,
+    reading only those changes.
+
+    To start a replica, take source.change_seq(), migrate() and replicate
+    from that checkpoint: changes replayed over the copy are harmless.
+    Args:
+        source: Database opened with change_feed
+        target: Database to bring up to date
+        since: Checkpoint returned by the previous call
+    Returns:
+        New checkpoint (since if there was nothing to apply)
+    Raises:
+        ValueError: If the changes after since were trimmed from the feed
+    """
+    ops = []
+    for event in source.changes(since):
+        if event["op"] == "delete":
+            ops.append({"op": "delete", "id": event["id"]})
+        else:
+            ops.append({"op": "create", "record": event["record"]})
+        since = event["seq"]
+    if ops:
+        _copy_banks(source, target)
+        _replay(target, ops)
+    return since
+
+
+def _copy_banks(source: DataBase, target: DataBase) -> None:
+    """Merge the banks table of source into target's, so the copied
+    records' "bank" references resolve there too."""
+    banks = source._backend.read_meta("banks") or {}
+    with target._backend.lock():
+        merged = target._backend.read_meta("banks") or {}
+        missing = {code: bank for code, bank in banks.items() if code not in merged}
+        if missing:
+            target._backend.write_meta("banks", {**merged, **missing})
+        target._banks = None  # read the table again on the next decode
+
+
+def _replay(target: DataBase, ops: List[Dict[str, Any]]) -> None:
+    """Write ops already validated elsewhere (created records replace
+    existing ones, deletes of missing ids are ignored)."""
+    with target._write_lock, target._backend.lock():
+        records = target._load()
+        target._recover_changes(records)
+        before: Dict[int, Optional[Dict[str, Any]]] = {}
+        applied, reorder, seqs = [], False, []
+        try:
+            for op in ops:
+                record_id = op["record"]["id"] if op["op"] == "create" else op["id"]
+                old = records.get(record_id)
+                if old is None and op["op"] != "create":
+                    continue  # nothing to delete or update
+                before.setdefault(record_id, old)
+                if old is None and record_id < target._id_index.last():
+                    reorder = True
+                apply_op(records, op)
+                applied.append(op)
+                target._on_change(old, records.get(record_id))
+            if reorder:  # a re-inserted id went to the end, restore id order
+                ordered = sorted(records.items())
+                records.clear()
+                records.update(ordered)
+            commits = [
+                [
+                    (i, old, records.get(i))
+                    for i, old in before.items()
+                    if old is not None or i in records
+                ]
+            ]
+            if not applied:
+                return
+            seqs = target._log_versions(commits)
+            target._log_changes(commits)
+            target._persist(records, applied)
+        except Exception:
+            target._records = None  # re-read whatever actually reached the store
+            target._aggregates_token = None  # the totals include the failed ops
+            if seqs:
+                target._abort_versions(seqs, commits)
+            target._abort_changes()
+            raise
+        target._token = target._backend.token()
+        target._save_aggregates()
+        target._publish()
+
+
 class USDB(DataBase):
     def __init__(
         self,
         path: Optional[str] = None,
         file_name: str = "user_data.json",
         user: Optional[Person] = None,
+        **options: Any,
     ):
-        super().__init__(path, file_name)
+        options.setdefault("indexes", {"full_name": False, "cpf": False})
+        options.setdefault("search_fields", ["full_name", "mother", "father"])
+        super().__init__(path, file_name, **options)
         self._user = user  # Changed to protected attribute
 
     def __repr__(self) -> str:
@@ -219,33 +1209,151 @@ class PWDB(DataBase):
         path: Optional[str] = None,
         file_name: str = "pass_data.json",
         user: Optional[Person] = None,
+        users: Optional[USDB] = None,
+        hash_algorithm: str = "pbkdf2_sha256",
+        work_factor: Optional[int] = None,
+        **options: Any,
     ):
-        super().__init__(path, file_name)
+        """Credentials database.
+
+        Passwords are stored as salted key derivations (see Credential.py);
+        plaintext passwords of older rows are replaced on the next login.
+        With users set, a credential only holds username, password hash and
+        the id of the customer in that USDB. Without it (and for rows
+        written before), the whole customer record is stored next to them.
+        Args:
+            users: Customer database the credentials refer to
+            hash_algorithm: "pbkdf2_sha256" or "scrypt"
+            work_factor: PBKDF2 iterations or scrypt log2(N) (default
+                Credential.DEFAULT_WORK_FACTOR)
+        Raises:
+            ValueError: If the hashing algorithm is unknown
+        """
+        if hash_algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown hashing algorithm {hash_algorithm!r}")
+        options.setdefault(
+            "indexes", {"username": True, "user_id": False, "cpf": False}
+        )
+        super().__init__(path, file_name, **options)
         self._user = user  # Changed to protected attribute
+        self._users = users
+        self._hash_algorithm = hash_algorithm
+        self._work_factor = work_factor
+        self._unknown_user_hash: Optional[str] = None
+
+    def _hash(self, password: str) -> str:
+        return hash_password(password, self._hash_algorithm, self._work_factor)
+
+    def _user_id(self, person: Person) -> Optional[int]:
+        """Id of the person in the users database, if registered (found by
+        cpf: names are not unique)."""
+        matches = self._users.find_by("cpf", person.get_cpf())
+        return matches[0]["id"] if matches else None
+
+    def _cpf(self, record: Dict[str, Any]) -> Optional[str]:
+        """CPF of the customer a credential belongs to."""
+        if record.get("user_id") is None:
+            return record.get("cpf")  # legacy row
+        if self._users is None:
+            return None
+        try:
+            return self._users.read_record(record["user_id"])["cpf"]
+        except ValueError:  # the customer was deleted
+            return None
 
     def create_record_pwd(
         self, username: str, password: str, new_record: Person
     ) -> Dict[str, Any]:
-        records = self.read_records()
-        record_data = self._encoder(new_record)
-        record_data["id"] = max((r["id"] for r in records), default=0) + 1
+        """Store a credential for a customer.
+        The customer is added to the users database if missing.
+        Raises:
+            ValueError: If the username already exists
+        """
+        if self._users is None:
+            record_data = self._encoder(new_record)
+        else:
+            user_id = self._user_id(new_record)
+            if user_id is None:
+                user_id = self._users.create_record(new_record)["id"]
+            record_data = {"id": None, "user_id": user_id}
+        record_data["id"] = None  # assigned when committed
         record_data["username"] = username
-        record_data["password"] = password
+        record_data["password"] = self._hash(password)
 
-        records.append(record_data)
-        self._save_records(records)
+        self._commit([{"op": "create", "record": record_data}])
         return record_data
 
+    def read_record_by_user(self, user: Person):
+        if self._users is not None:
+            user_id = self._user_id(user)
+            matches = self.find_by("user_id", user_id) if user_id is not None else []
+            if matches:
+                print(f"user id is: {matches[0]['id']}")
+                return [True, matches[0]]
+        matches = self.find_by("cpf", user.get_cpf())  # legacy rows
+        if matches:
+            print(f"user id is: {matches[0]['id']}")
+            return [True, matches[0]]
+        return [False, self.read_records()]
+
     def login_user_pwd(self, person: Person, username: str, password: str) -> bool:
-        records = self.read_records()
-        for record in records:
-            if (
-                record.get("username") == username
-                and record.get("password") == password
-                and record.get("full_name") == person.get_full_name()
-            ):
-                return True
-        return False
+        """Check a login with one username index probe and one hash.
+        A plaintext or outdated hash is rehashed after a successful login.
+        """
+        matches = self.find_by("username", username)
+        if not matches:
+            # hash anyway, so unknown usernames take as long as wrong passwords
+            if self._unknown_user_hash is None:
+                self._unknown_user_hash = self._hash("")
+            verify_password(password, self._unknown_user_hash)
+            return False
+
+        record = matches[0]
+        if not verify_password(password, record.get("password")):
+            return False
+        if self._cpf(record) != person.get_cpf():
+            return False
+        if needs_rehash(record.get("password"), self._hash_algorithm, self._work_factor):
+            self.update_record(record["id"], {"password": self._hash(password)})
+        return True
+
+    def normalize(self) -> int:
+        """Replace legacy rows holding a whole customer record by references
+        to the users database, adding missing customers there, and hash
+        their plaintext passwords.
+        Returns:
+            Number of rows rewritten
+        Raises:
+            ValueError: If the database has no users database
+        """
+        if self._users is None:
+            raise ValueError("PWDB has no users database to refer to")
+        ops = []
+        for record in self.read_records():
+            user_id, password = record.get("user_id"), record.get("password")
+            if password is not None and not is_hashed(password):
+                password = self._hash(password)
+            elif user_id is not None:
+                continue  # already normalized
+            if user_id is None:
+                person = self.read_person(record["id"])
+                user_id = self._user_id(person)
+                if user_id is None:
+                    user_id = self._users.create_record(person)["id"]
+            ops.append(
+                {
+                    "op": "create",  # replaces the row under the same id
+                    "record": {
+                        "id": record["id"],
+                        "user_id": user_id,
+                        "username": record.get("username"),
+                        "password": password,
+                    },
+                }
+            )
+        if ops:
+            self._commit(ops)
+        return len(ops)
 
     def __repr__(self) -> str:
         return f"PWDB(file='{self._file}', user={self._user})"
@@ -0,0 +1,281 @@
+import heapq
+import re
+from bisect import bisect_right, insort
+import unicodedata
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashIndex:
+    def __init__(self, field: str, unique: bool = False) -> None:
+        """Hash index from a record field to the ids holding that value.
+        Args:
+            field: Top level record key to index
+            unique: Reject a second record with the same value
+        """
+        self.field = field
+        self.unique = unique
+        # value -> ids, a dict is used as an insertion ordered set
+        self._entries: Dict[Any, Dict[int, None]] = {}
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Drop every entry and index the given records again."""
+        self._entries = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        value = record.get(self.field)
+        self._entries.setdefault(value, {})[record["id"]] = None
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        value = record.get(self.field)
+        ids = self._entries.get(value)
+        if ids is None:
+            return
+        ids.pop(record["id"], None)
+        if not ids:
+            del self._entries[value]
+
+    def changed(self, old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        """Whether updating a record from old to new touches the index."""
+        return old.get(self.field) != new.get(self.field)
+
+    def check(self, record: Dict[str, Any]) -> None:
+        """Validate a record before it is written.
+        Raises:
+            ValueError: If the index is unique and another record has the value
+        """
+        if not self.unique:
+            return
+        value = record.get(self.field)
+        if any(i != record["id"] for i in self._entries.get(value, ())):
+            raise ValueError(f"{self.field} {value!r} already exists")
+
+    def lookup(self, value: Any) -> List[int]:
+        """Ids of the records whose field equals value."""
+        return list(self._entries.get(value, ()))
+
+    def first(self, value: Any) -> Optional[int]:
+        """Id of the first record whose field equals value, if any."""
+        for record_id in self._entries.get(value, ()):
+            return record_id
+        return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"HashIndex(field='{self.field}', unique={self.unique})"
+
+
+class IdIndex:
+    def __init__(self) -> None:
+        """Sorted list of record ids, for reading pages in id order with a
+        binary search instead of walking the records."""
+        self._ids: List[int] = []
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> None:
+        self._ids = sorted(record["id"] for record in records)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        ids = self._ids
+        if not ids or record["id"] > ids[-1]:
+            ids.append(record["id"])  # new ids usually come last
+        else:
+            insort(ids, record["id"])
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        ids = self._ids
+        i = bisect_right(ids, record["id"]) - 1
+        if i >= 0 and ids[i] == record["id"]:
+            del ids[i]
+
+    def check(self, record: Dict[str, Any]) -> None:
+        """Nothing to validate."""
+
+    def last(self, default: int = 0) -> int:
+        """Highest id (default when there is none)."""
+        return self._ids[-1] if self._ids else default
+
+    def after(self, after_id: int, limit: int) -> List[int]:
+        """Up to limit ids greater than after_id, in order."""
+        start = bisect_right(self._ids, after_id)
+        return self._ids[start : start + max(limit, 0)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"IdIndex(ids={len(self._ids)})"
+
+
+def _words(text: Any) -> List[str]:
+    """Lowercase words of a text with accents removed ("João" -> "joao")."""
+    if not isinstance(text, str):
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    return _WORD.findall(folded.encode("ascii", "ignore").decode())
+
+
+def _trigrams(word: str) -> FrozenSet[str]:
+    padded = f"  {word} "  # so short words and word starts get trigrams too
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    def __init__(self, fields: Sequence[str], threshold: float = 0.3) -> None:
+        """Fuzzy text index over some record fields.
+
+        Each distinct word of the fields maps to the ids holding it, and each
+        trigram to the words containing it. A search compares the query
+        words with the vocabulary by trigram similarity (shared / all
+        trigrams), so only records holding a similar word are scored, and
+        names repeated across many records are indexed once.
+        Args:
+            fields: Top level record keys to index
+            threshold: Minimum similarity for a word to match
+        """
+        self.fields = tuple(fields)
+        self.threshold = threshold
+        self._postings: Dict[str, Set[int]] = {}
+        self._by_trigram: Dict[str, Set[str]] = {}
+        self._sizes: Dict[str, int] = {}
+
+    def _record_words(self, record: Dict[str, Any]) -> Set[str]:
+        return {word for field in self.fields for word in _words(record.get(field))}
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Drop every entry and index the given records again."""
+        self._postings, self._by_trigram, self._sizes = {}, {}, {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        for word in self._record_words(record):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                trigrams = _trigrams(word)
+                self._sizes[word] = len(trigrams)
+                for trigram in trigrams:
+                    self._by_trigram.setdefault(trigram, set()).add(word)
+            ids.add(record["id"])
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        for word in self._record_words(record):
+            ids = self._postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(record["id"])
+            if ids:
+                continue
+            # last record using the word: drop it from the vocabulary
+            del self._postings[word], self._sizes[word]
+            for trigram in _trigrams(word):
+                words = self._by_trigram[trigram]
+                words.discard(word)
+                if not words:
+                    del self._by_trigram[trigram]
+
+    def changed(self, old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        """Whether updating a record from old to new touches the index."""
+        return any(old.get(field) != new.get(field) for field in self.fields)
+
+    def check(self, record: Dict[str, Any]) -> None:
+        """Nothing to validate, fuzzy indexes are never unique."""
+
+    def similar_words(self, word: str) -> Dict[str, float]:
+        """Indexed words at least threshold similar to word, with their
+        similarity."""
+        trigrams = _trigrams(word)
+        shared: Dict[str, int] = {}
+        for trigram in trigrams:
+            for candidate in self._by_trigram.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        similar = {}
+        for candidate, count in shared.items():
+            score = count / (len(trigrams) + self._sizes[candidate] - count)
+            if score >= self.threshold:
+                similar[candidate] = score
+        return similar
+
+    def _tiers(self, word: str) -> List[Tuple[float, Set[int]]]:
+        """Records holding a word similar to word, grouped by similarity,
+        best first."""
+        by_score: Dict[float, List[Set[int]]] = {}
+        for candidate, score in self.similar_words(word).items():
+            by_score.setdefault(score, []).append(self._postings[candidate])
+        return [
+            (score, postings[0] if len(postings) == 1 else set().union(*postings))
+            for score, postings in sorted(by_score.items(), reverse=True)
+        ]
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """Best matching record ids for a text, best first.
+
+        A record scores, for each query word, the similarity of its closest
+        word (0 if none), averaged over the query words (1.0 when every
+        word is found as is). Combinations of similarity levels are visited
+        best total first and their records found by set intersection, so
+        only the records that make the result are touched one by one.
+        Returns:
+            (id, score) pairs, ties broken by id
+        """
+        query = list(dict.fromkeys(_words(text)))
+        # per query word: similarity levels, then "not found" (no constraint)
+        levels = [self._tiers(word) + [(0.0, None)] for word in query]
+        if not query or limit <= 0:
+            return []
+
+        def total(choice: Tuple[int, ...]) -> float:
+            return sum(levels[q][level][0] for q, level in enumerate(choice))
+
+        start = (0,) * len(levels)
+        heap = [(-total(start), start)]
+        visited = {start}
+        seen: Set[int] = set()
+        found: List[Tuple[int, float]] = []
+        while heap:
+            score, choice = heapq.heappop(heap)
+            score = -score
+            if score <= 0 or (len(found) >= limit and score < found[-1][1]):
+                break
+            sets = [
+                levels[q][level][1]
+                for q, level in enumerate(choice)
+                if levels[q][level][1] is not None
+            ]
+            sets.sort(key=len)
+            ids = sets[0].intersection(*sets[1:]) - seen
+            if ids:
+                seen |= ids
+                # within one score only the smallest ids can make the result
+                for record_id in heapq.nsmallest(limit, ids):
+                    found.append((record_id, score))
+            for q in range(len(choice)):
+                if choice[q] + 1 < len(levels[q]):
+                    following = choice[:q] + (choice[q] + 1,) + choice[q + 1 :]
+                    if following not in visited:
+                        visited.add(following)
+                        heapq.heappush(heap, (-total(following), following))
+
+        found.sort(key=lambda pair: (-pair[1], pair[0]))
+        return [(record_id, score / len(query)) for record_id, score in found[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def __repr__(self) -> str:
+        return f"TrigramIndex(fields={list(self.fields)}, words={len(self)})"
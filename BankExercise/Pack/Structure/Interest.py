@@ -0,0 +1,77 @@
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from Pack.Structure.DataBase import DataBase
+
+BUSINESS_DAYS_PER_YEAR = 252
+
+# share of the CDI paid per account type ("POUPANCA ... RENDIMENTO (110% CDI)")
+CDI_SHARE = {"Savings Account": 1.10}
+
+
+def daily_rates(
+    cdi_rate: float, account_types: Sequence[str], cdi_share: Dict[str, float]
+) -> np.ndarray:
+    """Daily rate of each account type.
+    Args:
+        cdi_rate: Annual CDI rate, e.g. 0.1065 for 10.65% a year
+        account_types: Account type names
+        cdi_share: Account type name -> fraction of the CDI it earns
+    Returns:
+        Array of daily rates aligned with account_types (0 when not earning)
+    """
+    cdi_daily = (1 + cdi_rate) ** (1 / BUSINESS_DAYS_PER_YEAR) - 1
+    return np.array([cdi_daily * cdi_share.get(name, 0.0) for name in account_types])
+
+
+def accrue_interest(
+    db: DataBase,
+    cdi_rate: float,
+    start: date,
+    end: date,
+    cdi_share: Optional[Dict[str, float]] = None,
+    holidays: Sequence[date] = (),
+) -> Dict[str, float]:
+    """Compound interest on every balance over the business days in [start, end)
+    and write the new balances back with one bulk update.
+    Args:
+        db: Customer database
+        cdi_rate: Annual CDI rate for the period
+        start: First day of the period
+        end: Day after the last day of the period
+        cdi_share: Fraction of the CDI per account type (default CDI_SHARE)
+        holidays: Days that are not business days
+    Returns:
+        Number of business days, accounts changed and total interest paid
+    """
+    days = int(np.busday_count(start, end, holidays=list(holidays)))
+    # hold the writer locks from the read to the write, so a deposit made
+    # meanwhile (in this process or another) is not overwritten
+    with db._write_lock, db._backend.lock():
+        records = db.read_records()
+        table = db.person_table(columns=["account_type"], records=records)
+        if days <= 0 or not len(table):
+            return {"days": max(days, 0), "accounts": 0, "interest": 0.0}
+
+        # one rate per account type, then one lookup per account by its type code
+        rates = daily_rates(cdi_rate, table.categories("account_type"), cdi_share or CDI_SHARE)
+        factors = (1 + rates) ** days
+        balances = table["balance"]
+        new_balances = np.round(balances * factors[table["account_type"]], 2)
+        changed = new_balances != balances
+
+        # table rows are aligned with records, so changed rows index them directly
+        rows = np.flatnonzero(changed).tolist()
+        updates = {}
+        for row, balance in zip(rows, new_balances[changed].tolist()):
+            record = records[row]
+            updates[record["id"]] = {"bank_account": {**record["bank_account"], "balance": balance}}
+        db.update_records(updates)
+
+    return {
+        "days": days,
+        "accounts": len(rows),
+        "interest": float((new_balances - balances)[changed].sum()),
+    }
@@ -0,0 +1,131 @@
+from typing import Any, Callable, Dict, Optional
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.Person import Person
+
+_UNSET = object()
+
+
+def decode_account(
+    account: Optional[Dict[str, Any]],
+    bank_of: Callable[[Dict[str, Any]], Optional[Bank]],
+) -> Optional[BankAccount]:
+    """Build the BankAccount of a stored bank_account (None when absent)."""
+    if not account:
+        return None
+    return BankAccount(
+        account_type=AccountType.from_name(account["account_type"]),
+        bank_holder=bank_of(account),
+        level=int(account["level"]),
+        balance=float(account["balance"]),
+    )
+
+
+class LazyPerson:
+    __slots__ = ("_record", "_bank_of", "_person", "_account")
+
+    def __init__(
+        self,
+        record: Dict[str, Any],
+        bank_of: Callable[[Dict[str, Any]], Optional[Bank]],
+    ) -> None:
+        """Read-mostly stand-in for a Person decoded from a stored record.
+
+        Getters convert only the field they return; the bank account is
+        built on first use. The first setter call builds a real Person,
+        which every later call goes to.
+        Args:
+            record: Stored record (shared with the cache, never modified)
+            bank_of: Resolves a stored bank_account to its Bank
+        """
+        self._record = record
+        self._bank_of = bank_of
+        self._person: Optional[Person] = None
+        self._account: Any = _UNSET
+
+    @property
+    def materialized(self) -> bool:
+        return self._person is not None
+
+    def to_person(self) -> Person:
+        """The real Person, built on the first call."""
+        if self._person is None:
+            record = self._record
+            self._person = Person(
+                full_name=str(record["full_name"]),
+                age=int(str(record["age"])),
+                cpf=str(record["cpf"]),
+                rg=str(record["rg"]),
+                mom=str(record["mother"]),
+                dad=str(record["father"]),
+                bank_account=self._bank_account(),
+            )
+        return self._person
+
+    def _bank_account(self) -> Optional[BankAccount]:
+        if self._account is _UNSET:
+            self._account = decode_account(self._record.get("bank_account"), self._bank_of)
+        return self._account
+
+    def get_bank_account(self) -> BankAccount:
+        if self._person is not None:
+            return self._person.get_bank_account()
+        return self._bank_account() or BankAccount("None", None, 1)
+
+    def get_full_name(self) -> str:
+        if self._person is not None:
+            return self._person.get_full_name()
+        return str(self._record["full_name"])
+
+    def get_age(self) -> int:
+        if self._person is not None:
+            return self._person.get_age()
+        return int(str(self._record["age"]))
+
+    def get_cpf(self) -> str:
+        if self._person is not None:
+            return self._person.get_cpf()
+        return str(self._record["cpf"])
+
+    def get_rg(self) -> str:
+        if self._person is not None:
+            return self._person.get_rg()
+        return str(self._record["rg"])
+
+    def get_mom(self) -> str:
+        if self._person is not None:
+            return self._person.get_mom()
+        return str(self._record["mother"])
+
+    def get_dad(self) -> str | None:
+        if self._person is not None:
+            return self._person.get_dad()
+        return str(self._record["father"])
+
+    def set_bank_account(self, account: BankAccount) -> None:
+        self.to_person().set_bank_account(account)
+
+    def set_full_name(self, full_name: str) -> None:
+        self.to_person().set_full_name(full_name)
+
+    def set_age(self, age: int) -> None:
+        self.to_person().set_age(age)
+
+    def set_cpf(self, cpf: str) -> None:
+        self.to_person().set_cpf(cpf)
+
+    def set_rg(self, rg: str) -> None:
+        self.to_person().set_rg(rg)
+
+    def set_mom(self, mom: str) -> None:
+        self.to_person().set_mom(mom)
+
+    def set_dad(self, dad: str | None) -> None:
+        self.to_person().set_dad(dad)
+
+    def __str__(self) -> str:
+        return str(self.to_person())
+
+    def __repr__(self) -> str:
+        state = "materialized" if self._person is not None else "lazy"
+        return f"LazyPerson(id={self._record.get('id')}, {state})"
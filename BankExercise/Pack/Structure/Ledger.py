@@ -0,0 +1,312 @@
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from Pack.Structure.DataBase import DataBase
+
+When = Union[datetime, float, None]
+
+
+def _timestamp(when: When) -> float:
+    if when is None:
+        return time.time()
+    if isinstance(when, datetime):
+        return when.timestamp()
+    return float(when)
+
+
+class Ledger:
+    def __init__(self, db: DataBase, snapshot_every: int = 1000) -> None:
+        """Append-only log of balance movements stored next to a DataBase.
+
+        Every deposit, withdrawal and transfer leg is appended to
+        <name>.ledger.jsonl. After snapshot_every entries the balance of
+        every account is appended to <name>.ledger.snapshots.jsonl together
+        with the log offset it covers, so any balance or statement is rebuilt
+        from the nearest snapshot plus at most snapshot_every entries.
+
+        Balances changed outside the ledger (interest accrual, a plain
+        update_record, another process) are picked up before each posting
+        as an "adjustment" entry, so the log always adds up to the stored
+        balance.
+        Args:
+            db: Database whose records hold the accounts (keyed by record id)
+            snapshot_every: Entries between two balance snapshots
+        """
+        base = os.path.splitext(db._file)[0]
+        self._db = db
+        self._log_file = f"{base}.ledger.jsonl"
+        self._snapshot_file = f"{base}.ledger.snapshots.jsonl"
+        self._snapshot_every = snapshot_every
+        # (ts, seq, log offset, position of the balances line) per snapshot
+        self._snapshots: List[Tuple[float, int, int, int]] = []
+        self._balances: Dict[int, float] = {}
+        self._seq = 0
+        self._last_ts = 0.0
+        self._since_snapshot = 0
+        self._offset = 0  # log bytes already applied to _balances
+        self._open()
+
+    def _open(self) -> None:
+        """Load the latest snapshot and replay the log tail after it."""
+        if os.path.exists(self._snapshot_file):
+            with open(self._snapshot_file, "rb") as f:
+                while True:
+                    header = f.readline()
+                    position = f.tell()
+                    balances = f.readline()
+                    if not balances.endswith(b"\n"):
+                        break  # torn snapshot, the log still has the entries
+                    meta = json.loads(header)
+                    self._snapshots.append(
+                        (meta["ts"], meta["seq"], meta["offset"], position)
+                    )
+
+        if self._snapshots:
+            self._last_ts, self._seq, self._offset, _ = self._snapshots[-1]
+            self._balances = self._snapshot_balances(len(self._snapshots) - 1)
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Apply the entries other Ledger instances appended to the log."""
+        for entry, offset in self._entries_from(self._offset):
+            self._apply(self._balances, entry)
+            self._seq, self._last_ts = entry["seq"], entry["ts"]
+            self._since_snapshot += 1
+            self._offset = offset
+
+    def _snapshot_balances(self, index: int) -> Dict[int, float]:
+        with open(self._snapshot_file, "rb") as f:
+            f.seek(self._snapshots[index][3])
+            return {int(k): v for k, v in json.loads(f.readline()).items()}
+
+    def _entries_from(self, offset: int) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """Yield (entry, offset after it) from a log offset, stopping at a
+        torn line."""
+        if not os.path.exists(self._log_file):
+            return
+        with open(self._log_file, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return
+                offset += len(line)
+                yield json.loads(line), offset
+
+    @staticmethod
+    def _apply(balances: Dict[int, float], entry: Dict[str, Any]) -> None:
+        balances[entry["account"]] = round(
+            balances.get(entry["account"], 0.0) + entry["amount"], 2
+        )
+
+    def _reconcile(
+        self,
+        account: int,
+        record: Dict[str, Any],
+        entries: List[Dict[str, Any]],
+        ts: float,
+    ) -> None:
+        """Open an account in the ledger with its stored balance, or post
+        the difference if the stored balance was changed elsewhere."""
+        balance = float((record.get("bank_account") or {}).get("balance") or 0.0)
+        if account not in self._balances:
+            entries.append(self._entry(account, "open", balance, ts))
+        elif round(balance - self._balances[account], 2):
+            difference = balance - self._balances[account]
+            entries.append(self._entry(account, "adjustment", difference, ts))
+
+    @staticmethod
+    def _entry(
+        account: int, kind: str, amount: float, ts: float, **extra: Any
+    ) -> Dict[str, Any]:
+        return {
+            "ts": ts,
+            "account": account,
+            "kind": kind,
+            "amount": round(amount, 2),
+            **extra,
+        }
+
+    def _post(self, movements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Check and write movements under the DataBase writer lock.
+
+        The log is first brought up to date and reconciled with the stored
+        balances, then the new balances are written to the DataBase and
+        the entries appended to the log in one write. A log write that
+        fails after the DataBase was updated is posted as an adjustment
+        next time, so the two never drift apart for good.
+        Raises:
+            ValueError: If an account doesn't exist, its balance is too low
+                or an entry is older than the last one
+        """
+        db = self._db
+        with db._write_lock, db._backend.lock():
+            self._catch_up()
+            ts = movements[0]["ts"]
+            if ts < self._last_ts:
+                raise ValueError("Entries must be posted in time order")
+            records = db._load()
+            entries: List[Dict[str, Any]] = []
+            for account in dict.fromkeys(m["account"] for m in movements):
+                if account not in records:
+                    raise ValueError(f"Record with ID {account} not found")
+                self._reconcile(account, records[account], entries, ts)
+            for movement in movements:
+                account = movement["account"]
+                if movement["amount"] < 0 and (
+                    self._projected(account, entries) + movement["amount"] < 0
+                ):
+                    raise ValueError(f"Insufficient funds in account {account}")
+                entries.append(movement)
+
+            balances = dict(self._balances)
+            for entry in entries:
+                self._apply(balances, entry)
+            touched = dict.fromkeys(entry["account"] for entry in entries)
+            db.update_records(
+                {
+                    account: {
+                        "bank_account": {
+                            **(records[account].get("bank_account") or {}),
+                            "balance": balances[account],
+                        }
+                    }
+                    for account in touched
+                }
+            )
+
+            for entry in entries:
+                self._seq += 1
+                entry["seq"] = self._seq
+            with open(self._log_file, "ab") as f:
+                f.write(
+                    "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+                )
+                self._offset = f.tell()
+            self._balances = balances
+            self._last_ts = ts
+
+            self._since_snapshot += len(entries)
+            if self._since_snapshot >= self._snapshot_every:
+                self.snapshot()
+        return entries
+
+    def _check(self, amount: float, ts: float) -> None:
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        if ts < self._last_ts:
+            raise ValueError("Entries must be posted in time order")
+
+    def deposit(
+        self, account: int, amount: float, when: When = None
+    ) -> Dict[str, Any]:
+        """Credit an account.
+        Raises:
+            ValueError: If the amount isn't positive or the account doesn't exist
+        """
+        ts = _timestamp(when)
+        self._check(amount, ts)
+        return self._post([self._entry(account, "deposit", amount, ts)])[-1]
+
+    def withdraw(
+        self, account: int, amount: float, when: When = None
+    ) -> Dict[str, Any]:
+        """Debit an account.
+        Raises:
+            ValueError: If the amount isn't positive or the balance is too low
+        """
+        ts = _timestamp(when)
+        self._check(amount, ts)
+        return self._post([self._entry(account, "withdrawal", -amount, ts)])[-1]
+
+    def transfer(
+        self, source: int, target: int, amount: float, when: When = None
+    ) -> List[Dict[str, Any]]:
+        """Move money between two accounts; both legs are written together.
+        Raises:
+            ValueError: If the amount isn't positive or the balance is too low
+        """
+        ts = _timestamp(when)
+        self._check(amount, ts)
+        if source == target:
+            raise ValueError("Cannot transfer to the same account")
+        return self._post(
+            [
+                self._entry(source, "transfer_out", -amount, ts, counterparty=target),
+                self._entry(target, "transfer_in", amount, ts, counterparty=source),
+            ]
+        )[-2:]
+
+    def _projected(self, account: int, entries: List[Dict[str, Any]]) -> float:
+        balance = self._balances.get(account, 0.0)
+        return balance + sum(e["amount"] for e in entries if e["account"] == account)
+
+    def snapshot(self) -> None:
+        """Append the balance of every account, covering the log up to now."""
+        with self._db._write_lock, self._db._backend.lock():
+            self._catch_up()
+            offset = self._offset
+            ts = self._last_ts
+            header = json.dumps({"seq": self._seq, "ts": ts, "offset": offset}) + "\n"
+            with open(self._snapshot_file, "ab") as f:
+                f.write(header.encode())
+                position = f.tell()
+                f.write((json.dumps(self._balances) + "\n").encode())
+            self._snapshots.append((ts, self._seq, offset, position))
+            self._since_snapshot = 0
+
+    def _replay_until(
+        self, ts: float, inclusive: bool = True
+    ) -> Tuple[Dict[int, float], int]:
+        """Balances of the nearest snapshot covering entries up to ts (or
+        strictly before ts), plus the log offset right after that snapshot."""
+        search = bisect_right if inclusive else bisect_left
+        index = search(self._snapshots, ts, key=lambda s: s[0]) - 1
+        if index < 0:
+            return {}, 0
+        return self._snapshot_balances(index), self._snapshots[index][2]
+
+    def balance(self, account: int, when: When = None) -> float:
+        """Balance of an account now, or as of a past date/timestamp."""
+        if when is None:
+            self._catch_up()
+            return self._balances.get(account, 0.0)
+        ts = _timestamp(when)
+        balances, offset = self._replay_until(ts)
+        for entry, _ in self._entries_from(offset):
+            if entry["ts"] > ts:
+                break
+            if entry["account"] == account:
+                self._apply(balances, entry)
+        return balances.get(account, 0.0)
+
+    def statement(
+        self, account: int, start: When, end: When = None
+    ) -> Dict[str, Any]:
+        """Entries of an account with start <= ts < end and the balances around them."""
+        start_ts, end_ts = _timestamp(start), _timestamp(end)
+        balances, offset = self._replay_until(start_ts, inclusive=False)
+        entries = []
+        for entry, _ in self._entries_from(offset):
+            if entry["ts"] >= end_ts:
+                break
+            if entry["account"] != account:
+                continue
+            if entry["ts"] < start_ts:
+                self._apply(balances, entry)
+            else:
+                entries.append(entry)
+        opening = balances.get(account, 0.0)
+        closing = round(opening + sum(e["amount"] for e in entries), 2)
+        return {
+            "account": account,
+            "opening": opening,
+            "entries": entries,
+            "closing": closing,
+        }
+
+    def __repr__(self) -> str:
+        return f"Ledger(file='{self._log_file}', seq={self._seq})"
@@ -0,0 +1,154 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# column name -> array typecode, numbers are stored as they are
+NUMERIC_COLUMNS = {"id": "q", "age": "q", "level": "q", "balance": "d"}
+# string columns are dictionary encoded: int32 codes into a list of values
+STRING_COLUMNS = ("full_name", "cpf", "rg", "mother", "father", "account_type", "bank")
+
+
+class PersonTable:
+    def __init__(
+        self, columns: Dict[str, np.ndarray], categories: Dict[str, List[Any]]
+    ) -> None:
+        """Columnar, read-only view of customer records.
+        Args:
+            columns: Column name -> NumPy array (codes for string columns)
+            categories: String column name -> values indexed by code
+        """
+        self._columns = columns
+        self._categories = categories
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Dict[str, Any]],
+        bank_of: Any = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> "PersonTable":
+        """Build the table in one pass without keeping the records.
+        Args:
+            records: Stored records, e.g. DataBase.iter_records()
+            bank_of: Resolves a bank account without a "bank" reference
+                (records written before the bank table) to a Bank
+            columns: String columns to load (default all); numbers are
+                always loaded
+        """
+        string_columns = STRING_COLUMNS if columns is None else [
+            name for name in STRING_COLUMNS if name in columns
+        ]
+        numbers = {name: array(code) for name, code in NUMERIC_COLUMNS.items()}
+        codes = {name: array("i") for name in string_columns}
+        lookups: Dict[str, Dict[Any, int]] = {name: {} for name in string_columns}
+        legacy_banks: Dict[str, Optional[str]] = {}
+
+        for record in records:
+            account = record.get("bank_account") or {}
+            bank = account.get("bank")
+            if bank is None and account.get("bank_holder") not in (None, "None"):
+                holder = account["bank_holder"]
+                if holder not in legacy_banks:
+                    resolved = bank_of(account) if bank_of else None
+                    legacy_banks[holder] = resolved.to_dict()["id_code"] if resolved else holder
+                bank = legacy_banks[holder]
+            numbers["id"].append(record["id"])
+            numbers["age"].append(record.get("age") or 0)
+            numbers["level"].append(account.get("level") or 0)
+            numbers["balance"].append(account.get("balance") or 0.0)
+            for name, column in codes.items():
+                if name == "account_type":
+                    value = account.get("account_type")
+                elif name == "bank":
+                    value = bank
+                else:
+                    value = record.get(name)
+                lookup = lookups[name]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                column.append(code)
+
+        columns = {
+            name: np.frombuffer(column, dtype=column.typecode)
+            for name, column in {**numbers, **codes}.items()
+        }
+        return cls(columns, {name: list(lookup) for name, lookup in lookups.items()})
+
+    def __len__(self) -> int:
+        return len(self._columns["id"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Raw column: values for numbers, int32 codes for strings."""
+        return self._columns[name]
+
+    def categories(self, name: str) -> List[Any]:
+        """Distinct values of a string column, indexed by their code."""
+        return self._categories[name]
+
+    def values(self, name: str) -> List[Any]:
+        """Decoded values of a column (materializes one list)."""
+        if name in self._categories:
+            categories = self._categories[name]
+            return [categories[code] for code in self._columns[name]]
+        return self._columns[name].tolist()
+
+    def eq(self, name: str, value: Any) -> np.ndarray:
+        """Boolean mask of rows where a column equals value."""
+        if name not in self._categories:
+            return self._columns[name] == value
+        try:
+            code = self._categories[name].index(value)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self._columns[name] == code
+
+    def isin(self, name: str, values: Sequence[Any]) -> np.ndarray:
+        """Boolean mask of rows where a column is one of values."""
+        if name not in self._categories:
+            return np.isin(self._columns[name], values)
+        categories = self._categories[name]
+        wanted = [code for code, value in enumerate(categories) if value in values]
+        return np.isin(self._columns[name], wanted)
+
+    def filter(self, mask: np.ndarray) -> "PersonTable":
+        """Rows selected by a boolean mask (categories are shared)."""
+        return PersonTable(
+            {name: column[mask] for name, column in self._columns.items()},
+            self._categories,
+        )
+
+    def group_count(self, by: str) -> Dict[Any, int]:
+        """Number of rows per value of a string column."""
+        counts = np.bincount(self._columns[by], minlength=len(self._categories[by]))
+        return {
+            value: int(count)
+            for value, count in zip(self._categories[by], counts)
+            if count
+        }
+
+    def group_sum(self, by: str, column: str) -> Dict[Any, float]:
+        """Sum of a numeric column per value of a string column."""
+        codes = self._columns[by]
+        sums = np.bincount(
+            codes, weights=self._columns[column], minlength=len(self._categories[by])
+        )
+        present = np.bincount(codes, minlength=len(self._categories[by])) > 0
+        return {
+            value: float(total)
+            for value, total, used in zip(self._categories[by], sums, present)
+            if used
+        }
+
+    def bands(self, column: str, edges: Sequence[float]) -> Dict[str, int]:
+        """Row counts of a numeric column per band between consecutive edges
+        (the last band includes its upper edge)."""
+        counts, _ = np.histogram(self._columns[column], bins=edges)
+        return {
+            f"{low}-{high}": int(count)
+            for low, high, count in zip(edges, edges[1:], counts)
+        }
+
+    def __repr__(self) -> str:
+        return f"PersonTable(rows={len(self)}, columns={list(self._columns)})"
@@ -0,0 +1,59 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+# equality conditions on (dotted) fields, or any test on the stored record
+Where = Union[Mapping[str, Any], Callable[[Dict[str, Any]], bool], None]
+
+
+def field_value(record: Dict[str, Any], path: str) -> Any:
+    """Value at a dotted path such as "bank_account.balance" (None if absent)."""
+    value: Any = record
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def matches(record: Dict[str, Any], where: Where) -> bool:
+    """Whether a stored record satisfies a where clause."""
+    if where is None:
+        return True
+    if callable(where):
+        return bool(where(record))
+    return all(field_value(record, path) == value for path, value in where.items())
+
+
+def project(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Copy only the requested fields, keyed by their (dotted) path; None
+    returns the record itself."""
+    if fields is None:
+        return record
+    return {path: field_value(record, path) for path in fields}
+
+
+def run_query(
+    records: Iterable[Dict[str, Any]],
+    where: Where = None,
+    fields: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Filter and project records one at a time, stopping after limit."""
+    if limit is not None and limit <= 0:
+        return
+    found = 0
+    for record in records:
+        if matches(record, where):
+            yield project(record, fields)
+            found += 1
+            if found == limit:
+                return
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+_MISSING = object()
+
+
+class QueryCache:
+    def __init__(self, maxsize: int = 256) -> None:
+        """Bounded LRU cache of query results.
+        Args:
+            maxsize: Number of results kept (0 disables caching)
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or _MISSING, refreshing its recency."""
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self._misses += 1
+        else:
+            self._hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "query_hits": self._hits,
+            "query_misses": self._misses,
+            "query_size": len(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cached_query(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Cache a DataBase read method in the instance's QueryCache.
+
+    The cache key is the backend's change token, the method name and its
+    (hashable) arguments, so a change on disk never serves a stale result;
+    mutations made through the instance empty the cache as well. Cached
+    results are shared between callers and must not be modified.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+        key: Tuple[Hashable, ...] = (
+            self._backend.token(),
+            method.__name__,
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        value = self._query_cache.get(key)
+        if value is _MISSING:
+            value = method(self, *args, **kwargs)
+            self._query_cache.put(key, value)
+        return value
+
+    return wrapper
@@ -0,0 +1,321 @@
+import heapq
+import os
+import random
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import count, islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from Pack.Structure.DataBase import DataBase
+from Pack.Structure.Person import Person
+from Pack.Structure.Query import Where, project, run_query
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+class _Shard(DataBase):
+    def __init__(self, shard: int, shards: int, *args: Any, **options: Any) -> None:
+        """One partition file; its ids are all congruent to shard modulo
+        shards, so an id alone tells which file holds the record."""
+        self._shard = shard
+        self._shards = shards
+        super().__init__(*args, **options)
+
+    def _next_id(self, records: Dict[int, Dict[str, Any]]) -> int:
+        return self._id_index.last(self._shard + 1 - self._shards) + self._shards
+
+
+def _query_shard(
+    db: DataBase,
+    where: Where,
+    fields: Optional[Sequence[str]],
+    limit: Optional[int],
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Matches of one shard as (id, result) pairs, so the shards can be
+    merged in id order even when the id is not among the fields."""
+    return [
+        (record["id"], project(record, fields))
+        for record in run_query(db.iter_records(), where, limit=limit)
+    ]
+
+
+def _query_shard_file(
+    path: Optional[str],
+    file: str,
+    options: Dict[str, Any],
+    where: Where,
+    fields: Optional[Sequence[str]],
+    limit: Optional[int],
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Pool task: stream one shard file, filter and project it."""
+    db = DataBase(path, file, **options)
+    try:
+        return _query_shard(db, where, fields, limit)
+    finally:
+        db.close()
+
+
+class ShardedDataBase:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        file: str = "data.json",
+        shards: int = 4,
+        by: str = "id",
+        workers: Optional[int] = None,
+        **options: Any,
+    ) -> None:
+        """Records split across several DataBase files.
+
+        <name>.<i><ext> holds shard i. With by="id" new records are spread
+        evenly over the shards; with by="cpf" a record lives in the shard
+        picked by a hash of its cpf, so find_by("cpf", ...) reads one file.
+        Either way record ids encode their shard (shard = (id - 1) % shards),
+        so every point operation touches a single file. Full scans fan out
+        over a process pool, one task per shard. Unique indexes are checked
+        per shard, so they only hold across shards for the cpf with by="cpf".
+        Args:
+            path: Directory path (created if doesn't exist)
+            file: Base filename, the shard number is inserted before the
+                extension
+            shards: Number of shard files
+            by: Partition key of new records: "id" or "cpf"
+            workers: Processes used by scans (default one per CPU, 0 or 1
+                scans in this process)
+            **options: DataBase options shared by every shard
+        Raises:
+            ValueError: If by is unknown or the directory was created with a
+                different layout
+        """
+        if by not in ("id", "cpf"):
+            raise ValueError(f"Unknown partition key {by!r}")
+        name, extension = os.path.splitext(file)
+        self._path = path
+        self._by = by
+        self._options = options
+        self._files = [f"{name}.{i}{extension}" for i in range(shards)]
+        self._shards = [_Shard(0, shards, path, self._files[0], **options)]
+        self._check_layout(shards, by)  # before creating any other file
+        self._shards += [
+            _Shard(i, shards, path, shard_file, **options)
+            for i, shard_file in enumerate(self._files[1:], start=1)
+        ]
+        # start at a random shard so processes don't all fill shard 0 first
+        self._round_robin = count(random.randrange(shards))
+        self._workers = os.cpu_count() if workers is None else workers
+        self._pool: Optional[Executor] = None
+
+    def _check_layout(self, shards: int, by: str) -> None:
+        """Record the layout next to the shards, refusing to reopen them
+        with another one (ids would point to the wrong files)."""
+        layout = {"shards": shards, "by": by}
+        backend = self._shards[0]._backend
+        with backend.lock():
+            stored = backend.read_meta("layout")
+            if stored is None:
+                backend.write_meta("layout", layout)
+            elif stored != layout:
+                raise ValueError(
+                    f"Shards were created with {stored}, not {layout}"
+                )
+
+    def shard_of(self, record_id: int) -> int:
+        """Number of the shard holding a record id."""
+        return (record_id - 1) % len(self._shards)
+
+    def _shard_for_cpf(self, cpf: Any) -> int:
+        # crc32 is stable across processes, unlike hash() of a str
+        return zlib.crc32(str(cpf).encode()) % len(self._shards)
+
+    def _shard_for(self, record: Person) -> _Shard:
+        """Shard a new record goes to."""
+        if self._by == "cpf":
+            return self._shards[self._shard_for_cpf(record.get_cpf())]
+        # round robin; the shard allocates the id, so no other shard is read
+        return self._shards[next(self._round_robin) % len(self._shards)]
+
+    def read_record(self, record_id: int) -> Dict[str, Any]:
+        """Get specific record by ID.
+        Raises:
+            ValueError: If record not found
+        """
+        return self._shards[self.shard_of(record_id)].read_record(record_id)
+
+    def create_record(self, new_record: Person) -> Dict[str, Any]:
+        """Add new record to its shard.
+        Returns:
+            Created record with generated ID
+        """
+        return self._shard_for(new_record).create_record(new_record)
+
+    def create_records(self, new_records: Iterable[Person]) -> List[Dict[str, Any]]:
+        """Add many records with one write per shard.
+        Returns:
+            Created records with generated IDs, in input order
+        Raises:
+            ValueError: If a record violates a unique index (none of its
+                shard's records are added)
+        """
+        people = list(new_records)
+        groups: Dict[int, List[int]] = {}
+        for position, person in enumerate(people):
+            if self._by == "cpf":
+                shard = self._shard_for_cpf(person.get_cpf())
+            else:
+                shard = next(self._round_robin) % len(self._shards)
+            groups.setdefault(shard, []).append(position)
+
+        created: List[Dict[str, Any]] = [{}] * len(people)
+        for shard, positions in groups.items():
+            records = self._shards[shard].create_records(people[p] for p in positions)
+            for position, record in zip(positions, records):
+                created[position] = record
+        return created
+
+    def update_record(
+        self, record_id: int, updated_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Update existing record.
+        Raises:
+            ValueError: If record not found
+        """
+        if self._by == "cpf" and "cpf" in updated_data:
+            current = self.read_record(record_id)["cpf"]
+            if self._shard_for_cpf(updated_data["cpf"]) != self._shard_for_cpf(current):
+                raise ValueError("Changing the cpf would move the record to another shard")
+        return self._shards[self.shard_of(record_id)].update_record(
+            record_id, updated_data
+        )
+
+    def update_records(
+        self, updates: Mapping[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Update many records with one write per shard (each shard is
+        atomic on its own, not across shards).
+        Returns:
+            Updated records, in mapping order
+        Raises:
+            ValueError: If a record is not found
+        """
+        groups: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        for record_id, data in updates.items():
+            groups.setdefault(self.shard_of(record_id), {})[record_id] = data
+        for shard, group in groups.items():
+            self._shards[shard].update_records(group)
+        return [self.read_record(record_id) for record_id in updates]
+
+    def delete_record(self, record_id: int) -> bool:
+        """Remove record by ID.
+        Raises:
+            ValueError: If record not found
+        """
+        return self._shards[self.shard_of(record_id)].delete_record(record_id)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield every record in id order, merging the shards lazily."""
+        return heapq.merge(
+            *(shard.iter_records() for shard in self._shards),
+            key=lambda record: record["id"],
+        )
+
+    def read_records(self) -> List[Dict[str, Any]]:
+        """Every record in id order."""
+        return list(self.iter_records())
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._workers)
+        return self._pool
+
+    def scan(self, where: Predicate) -> List[Dict[str, Any]]:
+        """Every record for which where(record) is true, in id order.
+
+        With workers > 1 each shard is parsed and filtered by its own process,
+        so where must be picklable (a module level function or a
+        functools.partial of one).
+        """
+        return self.query(where)
+
+    def query(
+        self,
+        where: Where = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """DataBase.query across the shards.
+
+        A cpf condition in a cpf-sharded database queries one shard (through
+        its indexes); otherwise every shard is filtered and projected by the
+        process pool, each stopping after limit matches.
+        """
+        if self._by == "cpf" and isinstance(where, Mapping) and "cpf" in where:
+            shard = self._shards[self._shard_for_cpf(where["cpf"])]
+            return shard.query(where, fields, limit)
+
+        if self._workers is not None and self._workers <= 1:
+            results = [
+                _query_shard(shard, where, fields, limit) for shard in self._shards
+            ]
+        else:
+            # workers stream the files themselves and keep no cache
+            options = {**self._options, "indexes": {}, "query_cache_size": 0}
+            count = len(self._files)
+            results = list(
+                self._executor().map(
+                    _query_shard_file,
+                    [self._path] * count,
+                    self._files,
+                    [options] * count,
+                    [where] * count,
+                    [fields] * count,
+                    [limit] * count,
+                )
+            )
+        merged = heapq.merge(*results, key=lambda pair: pair[0])
+        return [result for _, result in islice(merged, limit)]
+
+    def find_by(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        """Get every record whose field equals value.
+        A cpf lookup in a cpf-sharded database reads one shard (through its
+        index when declared); other fields are scanned across all shards.
+        Returns:
+            Matching records in id order
+        """
+        if field == "cpf" and self._by == "cpf":
+            return self._shards[self._shard_for_cpf(value)].find_by(field, value)
+        if field == "id":
+            try:
+                return [self.read_record(value)]
+            except ValueError:
+                return []
+        return self.query({field: value})
+
+    def compact(self) -> None:
+        """Compact every shard."""
+        for shard in self._shards:
+            shard.compact()
+
+    def close(self) -> None:
+        """Release the shards' file handles and stop the scan processes."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for shard in self._shards:
+            shard.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"ShardedDataBase(files={len(self._shards)}, by='{self._by}', "
+            f"first='{self._shards[0]._file}')"
+        )
@@ -0,0 +1,99 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from Pack.Structure.Person import Person
+
+if TYPE_CHECKING:
+    from Pack.Structure.DataBase import DataBase
+
+
+class Transaction:
+    def __init__(self, db: "DataBase") -> None:
+        """Mutations staged in memory and committed all together.
+
+        Nothing reaches the database until commit(): then the ops are
+        validated against the current records and written as one unit, or
+        not at all. Records read through read_record() are checked too: if
+        another writer changed one of them in the meantime, the commit
+        fails instead of overwriting that change. Concurrent commits are
+        grouped into a single write and fsync (see DataBase._commit_group).
+        Args:
+            db: Database the transaction writes to
+        """
+        self._db = db
+        self._ops: List[Dict[str, Any]] = []
+        self._reads: Dict[int, Dict[str, Any]] = {}  # id -> record as first read
+        self._closed = False
+
+    def _stage(self, op: Dict[str, Any]) -> None:
+        if self._closed:
+            raise ValueError("Transaction already committed or rolled back")
+        self._ops.append(op)
+
+    def read_record(self, record_id: int) -> Dict[str, Any]:
+        """Read a record the staged ops depend on; commit() fails if it
+        changed before the transaction is written.
+        Raises:
+            ValueError: If record not found
+        """
+        if self._closed:
+            raise ValueError("Transaction already committed or rolled back")
+        record = self._db.read_record(record_id)
+        return self._reads.setdefault(record_id, record)
+
+    def create_record(self, new_record: Person) -> Dict[str, Any]:
+        """Stage a new record.
+        Returns:
+            The record to create; its id is filled in on commit
+        """
+        record_data = self._db._encoder(new_record)
+        record_data["id"] = None  # assigned when committed
+        self._stage({"op": "create", "record": record_data})
+        return record_data
+
+    def update_record(self, record_id: int, updated_data: Dict[str, Any]) -> None:
+        """Stage an update of some fields of a record."""
+        self._stage({"op": "update", "id": record_id, "data": updated_data})
+
+    def delete_record(self, record_id: int) -> None:
+        """Stage the removal of a record."""
+        self._stage({"op": "delete", "id": record_id})
+
+    def commit(self) -> None:
+        """Apply every staged op atomically.
+        Raises:
+            ValueError: If a record is missing, a unique index is violated
+                or a record read by the transaction changed since (nothing
+                is written; run the transaction again)
+        """
+        self._close()
+        if self._ops:
+            self._db._commit_group(self._ops, self._reads)
+
+    def rollback(self) -> None:
+        """Discard the staged ops."""
+        self._close()
+        self._ops = []
+        self._reads = {}
+
+    def _close(self) -> None:
+        if self._closed:
+            raise ValueError("Transaction already committed or rolled back")
+        self._closed = True
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, exc_type: Optional[type], exc: Any, tb: Any) -> None:
+        """Commit when the block succeeds, roll back when it raises."""
+        if self._closed:
+            return
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def __repr__(self) -> str:
+        return f"Transaction(ops={len(self._ops)}, closed={self._closed})"
@@ -0,0 +1,294 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from Pack.Structure.Backend import replace_file
+
+if TYPE_CHECKING:
+    from Pack.Structure.DataBase import DataBase
+
+Record = Optional[Dict[str, Any]]
+# (id, record before, record after) for every record a commit changed
+Changes = List[Tuple[int, Record, Record]]
+
+
+class VersionStore:
+    def __init__(self, path: str, retention: Optional[float] = None) -> None:
+        """Past versions of records, appended to a JSON lines file.
+
+        Every commit gets the next sequence number and one line holding the
+        new version of each record it changed (null for a delete) plus,
+        the first time a record changes, the version it replaces under
+        sequence 0. Records that never changed have no versions: their
+        current value is valid at every sequence.
+        Args:
+            path: Version log file
+            retention: Seconds old versions stay readable (None = forever)
+        """
+        self.path = path
+        self.retention = retention
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.seq = 0
+        self.horizon = 0  # oldest sequence that can still be read
+        # id -> [(seq, record)] ascending, (seq, timestamp) of each commit
+        self._history: Dict[int, List[Tuple[int, Record]]] = {}
+        self._commits: List[Tuple[int, float]] = []
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        self._since_gc = 0
+
+    def refresh(self) -> None:
+        """Read the lines other processes appended (or the whole file
+        again after a garbage collection replaced it)."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if self._file_id != (st.st_dev, st.st_ino) or st.st_size < self._offset:
+                self._reset()
+                self._file_id = (st.st_dev, st.st_ino)
+            if st.st_size == self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn or still being written
+                    self._offset += len(line)
+                    self._read_line(json.loads(line))
+
+    def _read_line(self, entry: Dict[str, Any]) -> None:
+        if "horizon" in entry:  # header written by gc()
+            self.seq, self.horizon = entry["seq"], entry["horizon"]
+        elif "abort" in entry:
+            for record_id in entry["ids"]:
+                versions = self._history.get(record_id, [])
+                if versions and versions[-1][0] == entry["abort"]:
+                    versions.pop()
+                if not versions:  # only the aborted create was logged
+                    self._history.pop(record_id, None)
+            if self._commits and self._commits[-1][0] == entry["abort"]:
+                self._commits.pop()
+        else:
+            for record_id, record in entry.get("base", ()):
+                self._history.setdefault(record_id, []).insert(0, (0, record))
+            for record_id, record in entry["changes"]:
+                self._history.setdefault(record_id, []).append((entry["seq"], record))
+            self._commits.append((entry["seq"], entry["ts"]))
+            self.seq = max(self.seq, entry["seq"])
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.refresh()
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            for entry in entries:
+                self._read_line(entry)
+            st = os.stat(self.path)
+            self._file_id, self._offset = (st.st_dev, st.st_ino), st.st_size
+
+    def append(self, commits: List[Changes]) -> List[int]:
+        """Give each commit the next sequence number and log its versions.
+        The caller holds the writer lock.
+        Returns:
+            Sequence number of each commit
+        """
+        with self._lock:
+            self.refresh()
+            now = max(time.time(), self._commits[-1][1] if self._commits else 0.0)
+            entries, seqs = [], []
+            logged = set(self._history)
+            for changes in commits:
+                seq = self.seq + len(seqs) + 1
+                base = [
+                    [record_id, old]
+                    for record_id, old, _ in changes
+                    if record_id not in logged and old is not None
+                ]
+                logged.update(record_id for record_id, _, _ in changes)
+                entries.append(
+                    {
+                        "seq": seq,
+                        "ts": now,
+                        "changes": [[record_id, new] for record_id, _, new in changes],
+                        "base": base,
+                    }
+                )
+                seqs.append(seq)
+            self._write(entries)
+            self._since_gc += sum(len(changes) for changes in commits)
+            return seqs
+
+    def abort(self, seqs: List[int], commits: List[Changes]) -> None:
+        """Withdraw logged commits whose data could not be written."""
+        self._write(
+            [
+                {"abort": seq, "ids": [record_id for record_id, _, _ in changes]}
+                for seq, changes in reversed(list(zip(seqs, commits)))
+            ]
+        )
+
+    def seq_at(self, when: float) -> int:
+        """Sequence number of the state at a timestamp.
+        Raises:
+            ValueError: If that state is older than the retention window
+        """
+        i = bisect_right(self._commits, when, key=lambda commit: commit[1])
+        seq = self._commits[i - 1][0] if i else 0
+        if seq < self.horizon or (not i and self.horizon):
+            raise ValueError("Versions that old were garbage-collected")
+        return seq
+
+    def version(self, record_id: int, seq: int) -> Tuple[bool, Record]:
+        """Version of a record at seq: (False, None) if the record never
+        changed (its current value holds), else (True, record or None)."""
+        versions = self._history.get(record_id)
+        if not versions:
+            return False, None
+        i = bisect_right(versions, seq, key=lambda version: version[0])
+        return True, versions[i - 1][1] if i else None
+
+    def as_of(
+        self, records: Dict[int, Dict[str, Any]], seq: int
+    ) -> Dict[int, Dict[str, Any]]:
+        """Every record as it was at seq, in id order.
+        Args:
+            records: Current records
+        Raises:
+            ValueError: If seq is outside the readable window
+        """
+        self.check(seq)
+        history = dict(self._history)  # writers of this process may append
+        state = {i: r for i, r in list(records.items()) if i not in history}
+        for record_id in history:
+            _, record = self.version(record_id, seq)
+            if record is not None:
+                state[record_id] = record
+        return dict(sorted(state.items()))
+
+    def check(self, seq: int) -> None:
+        if not self.horizon <= seq <= self.seq:
+            raise ValueError(
+                f"Sequence {seq} is outside the readable window "
+                f"[{self.horizon}, {self.seq}]"
+            )
+
+    def history(self, record_id: int) -> List[Dict[str, Any]]:
+        """Kept versions of a record, oldest first (seq 0 = before the
+        first logged change)."""
+        timestamps = dict(self._commits)
+        return [
+            {"seq": seq, "ts": timestamps.get(seq), "record": record}
+            for seq, record in self._history.get(record_id, [])
+        ]
+
+    def due_for_gc(self) -> bool:
+        return self.retention is not None and self._since_gc >= 1000
+
+    def gc(
+        self, records: Dict[int, Dict[str, Any]], now: Optional[float] = None
+    ) -> int:
+        """Drop the versions older than the retention window, keeping for
+        each record the one still valid at the window's start, and rewrite
+        the log. The caller holds the writer lock.
+        Args:
+            records: Current records
+        Returns:
+            Number of versions dropped
+        """
+        with self._lock:
+            return self._gc(records, now)
+
+    def _gc(self, records: Dict[int, Dict[str, Any]], now: Optional[float]) -> int:
+        self.refresh()
+        if self.retention is None:
+            return 0
+        now = time.time() if now is None else now
+        i = bisect_right(self._commits, now - self.retention, key=lambda c: c[1])
+        horizon = max(self.horizon, self._commits[i - 1][0] if i else 0)
+        dropped = 0
+        for record_id in list(self._history):
+            versions = self._history[record_id]
+            start = max(bisect_right(versions, horizon, key=lambda v: v[0]) - 1, 0)
+            kept = versions[start:]
+            (seq, record), *newer = kept
+            if not newer and seq <= horizon and record == records.get(record_id):
+                kept = []  # same as the current value, like a record never changed
+            dropped += len(versions) - len(kept)
+            if kept:
+                self._history[record_id] = kept
+            else:
+                del self._history[record_id]
+
+        commits = [(seq, ts) for seq, ts in self._commits if seq >= horizon]
+        by_seq: Dict[int, List[List[Any]]] = {}
+        base = []
+        for record_id, versions in self._history.items():
+            for seq, record in versions:
+                if seq == 0:
+                    base.append([record_id, record])
+                else:
+                    by_seq.setdefault(seq, []).append([record_id, record])
+        timestamps = dict(self._commits)
+
+        def write(f: Any) -> None:
+            f.write(json.dumps({"horizon": horizon, "seq": self.seq}) + "\n")
+            seqs = sorted(set(by_seq) | {seq for seq, _ in commits})
+            for n, seq in enumerate(seqs):
+                entry = {
+                    "seq": seq,
+                    "ts": timestamps[seq],
+                    "changes": by_seq.get(seq, []),
+                }
+                if n == 0:
+                    entry["base"] = base
+                f.write(json.dumps(entry) + "\n")
+            if not seqs and base:
+                entry = {"seq": 0, "ts": 0.0, "changes": [], "base": base}
+                f.write(json.dumps(entry) + "\n")
+
+        try:
+            replace_file(self.path, write)
+        except OSError:
+            self._reset()  # the old log is intact: read it back
+            self.refresh()
+            raise
+        self.refresh()  # the file was replaced: read it back
+        self._since_gc = 0
+        return dropped
+
+    def __repr__(self) -> str:
+        return f"VersionStore(path='{self.path}', seq={self.seq})"
+
+
+class Snapshot:
+    def __init__(self, db: "DataBase", seq: int) -> None:
+        """Read-only view of a DataBase as it was at one sequence number.
+
+        Writers keep committing; the snapshot keeps answering with the
+        versions it pinned, as long as they stay within the retention window.
+        """
+        self._db = db
+        self.seq = seq
+
+    def read_record(self, record_id: int) -> Dict[str, Any]:
+        """Raises:
+            ValueError: If the record did not exist at this point
+        """
+        return self._db.read_record_as_of(record_id, seq=self.seq)
+
+    def read_records(self) -> List[Dict[str, Any]]:
+        return self._db.read_records_as_of(seq=self.seq)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.read_records())
+
+    def __repr__(self) -> str:
+        return f"Snapshot(seq={self.seq})"
@@ -0,0 +1,100 @@
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from Pack.Structure.Credential import hash_password
+from Pack.Structure.DataBase import PWDB, USDB
+from Pack.Structure.Person import Person
+
+'''
+logins per second and p99 login latency of PWDB for several key derivation
+work factors and user counts, to size the work factor against the peak
+login rate (one login costs about one hash).
+run from the BankExercise folder:
+    python -m Pack.Tester.bench_auth [logins per setting]
+'''
+
+
+'== == == == == == == benchmark section == == == == == == =='
+
+USER_COUNTS = (1_000, 10_000)
+SETTINGS = (
+    ("pbkdf2_sha256", 10_000),
+    ("pbkdf2_sha256", 100_000),
+    ("pbkdf2_sha256", 600_000),
+    ("scrypt", 14),
+)
+PASSWORD = "correct horse!"
+
+
+def person(i:int) -> Person:
+    return Person(
+        full_name=f"Customer {i}",
+        age=30,
+        cpf=f"{i:011d}",
+        rg=f"{i:09d}",
+        mom="Mother",
+        dad="Father",
+    )
+
+
+def make_databases(users:int, algorithm:str, work_factor:int) -> PWDB:
+    folder = tempfile.mkdtemp()
+    user_db = USDB(f"{folder}/UserData")
+    user_db.create_records(person(i) for i in range(users))
+    pass_db = PWDB(
+        f"{folder}/PassData",
+        users=user_db,
+        hash_algorithm=algorithm,
+        work_factor=work_factor,
+    )
+    # one hash shared by every row: hashing each user would dominate the
+    # setup and logins cost the same either way
+    stored = hash_password(PASSWORD, algorithm, work_factor)
+    pass_db._commit([
+        {
+            "op": "create",
+            "record": {
+                "id": None,
+                "user_id": i + 1,
+                "username": f"user{i}",
+                "password": stored,
+            },
+        }
+        for i in range(users)
+    ])
+    return pass_db
+
+
+def run(users:int, algorithm:str, work_factor:int, logins:int) -> tuple:
+    pass_db = make_databases(users, algorithm, work_factor)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(logins):
+        i = random.randrange(users)
+        begin = time.perf_counter()
+        ok = pass_db.login_user_pwd(person(i), f"user{i}", PASSWORD)
+        latencies.append(time.perf_counter() - begin)
+        assert ok
+    elapsed = time.perf_counter() - start
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    return logins / elapsed, p99
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{logins} logins per setting")
+    print(f"{'algorithm':>14} {'work':>8} {'users':>7} {'logins/s':>9} {'p99 ms':>8}")
+    for algorithm, work_factor in SETTINGS:
+        for users in USER_COUNTS:
+            rate, p99 = run(users, algorithm, work_factor, logins)
+            print(
+                f"{algorithm:>14} {work_factor:>8} {users:>7} "
+                f"{rate:>9.1f} {p99 * 1000:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
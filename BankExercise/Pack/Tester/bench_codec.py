@@ -0,0 +1,81 @@
+import io
+import sys
+import tempfile
+import time
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.Codec import CODECS
+from Pack.Structure.DataBase import DataBase
+from Pack.Structure.Person import Person
+
+'''
+compare file size and encode/decode throughput of the DataBase codecs.
+run from the BankExercise folder:
+    python -m Pack.Tester.bench_codec [records]
+'''
+
+BANKS = [
+    Bank(name="Wise", location="Belgium", id_code="01123-1"),
+    Bank(name="Revolut", location="Belgium", id_code="01313-1"),
+]
+
+
+def make_records(count: int) -> list:
+    db = DataBase(tempfile.mkdtemp())  # only the encoder is needed
+    records = []
+    for i in range(count):
+        person = Person(
+            full_name=f"customer number {i}",
+            age=18 + i % 60,
+            cpf=f"{i:09d}-00",
+            rg=f"{i:08d}-0",
+            mom=f"mother of {i}",
+            dad=f"father of {i}",
+            bank_account=BankAccount(
+                AccountType(1 + i % 3),
+                bank_holder=BANKS[i % 2],
+                level=1 + i % 3,
+                balance=i * 1.5,
+            ),
+        )
+        record = db._encoder(person)
+        record["id"] = i + 1
+        records.append(record)
+    return records
+
+
+def bench(codec, records: list) -> tuple:
+    buffer = io.BytesIO() if codec.binary else io.StringIO()
+
+    start = time.perf_counter()
+    codec.dump(records, buffer)
+    encode_time = time.perf_counter() - start
+
+    data = buffer.getvalue()
+    size = len(data if codec.binary else data.encode())
+    buffer.seek(0)
+
+    start = time.perf_counter()
+    decoded = codec.load(buffer)
+    decode_time = time.perf_counter() - start
+
+    assert decoded == records, f"{codec.name} round trip failed"
+    return size, encode_time, decode_time
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = make_records(count)
+
+    print(f"{count} records")
+    print(f"{'format':<8}{'size (KB)':>12}{'bytes/rec':>11}{'encode rec/s':>15}{'decode rec/s':>15}")
+    for codec in CODECS.values():
+        size, encode_time, decode_time = bench(codec, records)
+        print(
+            f"{codec.name:<8}{size / 1024:>12.0f}{size / count:>11.1f}"
+            f"{count / encode_time:>15.0f}{count / decode_time:>15.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
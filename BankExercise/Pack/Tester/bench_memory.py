@@ -0,0 +1,81 @@
+import sys
+import tracemalloc
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+
+'''
+per-account heap cost of BankAccount objects, before and after interning
+AccountType/Bank and adding __slots__.
+run from the BankExercise folder:
+    python -m Pack.Tester.bench_memory [accounts]
+'''
+
+
+'== == == == == == == previous classes (for comparison) == == == == == == =='
+
+class OldBank:
+    def __init__(self, name:str, location:str, id_code:int|str) -> None:
+        self.__location = location
+        self.__id = id_code
+        self.__name = name
+
+
+class OldAccountType:
+    def __init__(self, account_choice:int) -> None:
+        self.__account_type = {
+            1: "Savings Account",
+            2: "Current Account",
+            3: "Special Account",
+        }
+        self.__account = self.__account_type[account_choice]
+
+
+class OldBankAccount:
+    def __init__(self, account_type:OldAccountType, bank_holder:OldBank, level:int=0, balance:float|int=0) -> None:
+        self.__account_type = account_type
+        self.__bank_holder = bank_holder
+        self.__level = level
+        self.__balance = balance
+
+
+'== == == == == == == benchmark section == == == == == == =='
+
+def old_account(i:int) -> OldBankAccount:
+    # every decoded record used to build its own Bank and AccountType
+    return OldBankAccount(
+        OldAccountType(1 + i % 3),
+        OldBank(name="Wise", location="Belgium", id_code="01123-1"),
+        level=2,
+        balance=float(i),
+    )
+
+
+def new_account(i:int) -> BankAccount:
+    return BankAccount(
+        AccountType(1 + i % 3),
+        Bank(name="Wise", location="Belgium", id_code="01123-1"),
+        level=2,
+        balance=float(i),
+    )
+
+
+def measure(factory, count:int) -> float:
+    tracemalloc.start()
+    accounts = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del accounts
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    before = measure(old_account, count)
+    after = measure(new_account, count)
+    print(f"{count} accounts")
+    print(f"before: {before:8.1f} bytes/account")
+    print(f"after:  {after:8.1f} bytes/account ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import time
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.DataBase import DataBase
+from Pack.Structure.Person import Person
+from Pack.Structure.Sharded import ShardedDataBase
+
+'''
+full scan time of one DataBase file against the same records split over
+shards and scanned by a process pool (each scan parses the files again).
+run from the BankExercise folder:
+    python -m Pack.Tester.bench_sharded [records]
+'''
+
+
+'== == == == == == == benchmark section == == == == == == =='
+
+def person(i:int) -> Person:
+    return Person(
+        full_name=f"Customer {i}",
+        age=18 + i % 60,
+        cpf=f"{i:011d}",
+        rg=f"{i:09d}",
+        mom="Mother",
+        dad="Father",
+        bank_account=BankAccount(
+            AccountType(1 + i % 3), Bank("Wise", "Belgium", "01123-1"), 1, float(i)
+        ),
+    )
+
+
+def is_senior(record:dict) -> bool:
+    return record["age"] >= 65
+
+
+def timed(scan) -> tuple:
+    start = time.perf_counter()
+    found = scan()
+    elapsed = time.perf_counter() - start
+    return elapsed, len(found)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    shards = max(os.cpu_count() or 1, 2)
+    people = [person(i) for i in range(count)]
+    options = {"format": "jsonl", "indexes": {}, "query_cache_size": 0}
+
+    folder = tempfile.mkdtemp()
+    DataBase(folder, **options).create_records(people)
+    single = DataBase(folder, **options)  # nothing cached, scans read the file
+    sharded = ShardedDataBase(
+        tempfile.mkdtemp(), shards=shards, workers=shards, **options
+    )
+    sharded.create_records(people)
+    sharded.scan(is_senior)  # start the pool
+
+    print(f"{count} records, {shards} shards")
+    elapsed, found = timed(lambda: [r for r in single.iter_records() if is_senior(r)])
+    print(f"single file:  {elapsed:6.3f}s ({found} found)")
+    elapsed, found = timed(lambda: sharded.scan(is_senior))
+    print(f"sharded scan: {elapsed:6.3f}s ({found} found)")
+    sharded.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+import tempfile
+import threading
+import time
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.DataBase import DataBase
+from Pack.Structure.Person import Person
+
+'''
+transfer throughput of DataBase transactions (journal + fsync per commit)
+as more threads commit at the same time and group commit batches them.
+run from the BankExercise folder:
+    python -m Pack.Tester.bench_transactions [transfers per thread]
+'''
+
+
+'== == == == == == == benchmark section == == == == == == =='
+
+ACCOUNTS = 100
+
+
+def make_db() -> DataBase:
+    db = DataBase(tempfile.mkdtemp(), journal=True, compact_threshold=None)
+    db.create_records(
+        Person(
+            full_name=f"Customer {i}",
+            age=30,
+            cpf=f"{i:011d}",
+            rg=f"{i:09d}",
+            mom="Mother",
+            dad="Father",
+            bank_account=BankAccount(
+                AccountType(1), Bank("Wise", "Belgium", "01123-1"), 1, 1000.0
+            ),
+        )
+        for i in range(ACCOUNTS)
+    )
+    return db
+
+
+def transfer(db:DataBase, source:int, target:int, amount:float) -> None:
+    # both legs are written by one transaction; a transfer whose balances
+    # were changed by a concurrent one is rejected and run again
+    while True:
+        try:
+            with db.transaction() as tx:
+                for record_id, delta in ((source, -amount), (target, amount)):
+                    account = tx.read_record(record_id)["bank_account"]
+                    tx.update_record(
+                        record_id,
+                        {"bank_account": {**account, "balance": account["balance"] + delta}},
+                    )
+            return
+        except ValueError:
+            continue
+
+
+def run(threads:int, transfers:int) -> float:
+    db = make_db()
+
+    def worker(n:int) -> None:
+        for i in range(transfers):
+            source = (n * transfers + i) % ACCOUNTS
+            transfer(db, source + 1, (source + 1) % ACCOUNTS + 1, 1.0)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return threads * transfers / elapsed
+
+
+def main():
+    transfers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{transfers} transfers per thread, {ACCOUNTS} accounts")
+    for threads in (1, 2, 4, 8, 16, 32):
+        print(f"{threads:3d} threads: {run(threads, transfers):8.0f} transfers/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+import json
+import tempfile
+import threading
+import unittest
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.DataBase import PWDB, USDB, DataBase, migrate, replicate
+from Pack.Structure.Person import Person
+
+'''
+regression tests for DataBase.
+run from the BankExercise folder:
+    python -m unittest Pack.Tester.test_database
+'''
+
+
+def person(i:int) -> Person:
+    return Person(
+        full_name=f"Customer {i}",
+        age=30,
+        cpf=f"{i:011d}",
+        rg=f"{i:09d}",
+        mom="Mother",
+        dad="Father",
+    )
+
+
+class RollbackTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.db = DataBase(self.folder, "data.json", group_commit_window=0)
+        self.db.create_records(person(i) for i in range(3))
+
+    def assert_in_id_order(self) -> None:
+        ids = [record["id"] for record in self.db.read_records()]
+        self.assertEqual(ids, sorted(ids))
+        with open(self.db._file) as f:
+            stored = [record["id"] for record in json.load(f)]
+        self.assertEqual(stored, sorted(stored))
+
+    def assert_create_keeps_others(self) -> None:
+        before = {r["id"]: r["full_name"] for r in self.db.read_records()}
+        created = self.db.create_record(person(99))
+        self.assertNotIn(created["id"], before)
+        after = {r["id"]: r["full_name"] for r in self.db.read_records()}
+        for record_id, name in before.items():
+            self.assertEqual(after[record_id], name)
+
+    def test_failed_transaction_keeps_id_order(self) -> None:
+        with self.assertRaises(ValueError):
+            with self.db.transaction() as tx:
+                tx.update_record(1, {"age": 40})
+                tx.delete_record(42)
+        self.assertEqual(self.db.read_record(1)["age"], 30)
+        self.assert_in_id_order()
+        self.assert_create_keeps_others()
+        self.assert_in_id_order()
+
+    def test_failed_update_records_keeps_id_order(self) -> None:
+        with self.assertRaises(ValueError):
+            self.db.update_records({1: {"age": 40}, 42: {"age": 41}})
+        self.assert_in_id_order()
+        self.assert_create_keeps_others()
+
+    def test_failed_transaction_with_delete_restores_record(self) -> None:
+        with self.assertRaises(ValueError):
+            with self.db.transaction() as tx:
+                tx.delete_record(2)
+                tx.update_record(1, {"age": 40})
+                tx.delete_record(42)
+        self.assertEqual(self.db.read_record(2)["full_name"], "Customer 1")
+        self.assert_in_id_order()
+        self.assert_create_keeps_others()
+
+    def test_failed_write_keeps_the_totals(self) -> None:
+        before = self.db.aggregates()
+
+        def fail(*args, **kwargs) -> None:
+            raise OSError("disk full")
+
+        self.db._backend.persist = fail
+        with self.assertRaises(OSError):
+            self.db.create_record(person(9))
+        with self.assertRaises(OSError):
+            with self.db.transaction() as tx:
+                tx.delete_record(1)
+        del self.db._backend.persist
+        self.assertEqual(self.db.aggregates(), before)
+
+    def test_failed_group_commits_keep_id_order(self) -> None:
+        db = DataBase(self.folder, "group.json", group_commit_window=0.002)
+        db.create_records(person(i) for i in range(8))
+
+        def work(i:int) -> None:
+            for n in range(20):
+                try:
+                    with db.transaction() as tx:
+                        tx.update_record(i + 1, {"age": n})
+                        if n % 2:
+                            tx.delete_record(1000 + i)  # fails the transaction
+                except ValueError:
+                    pass
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.db = db
+        self.assert_in_id_order()
+        self.assert_create_keeps_others()
+
+
+class TransactionTest(unittest.TestCase):
+
+    def test_concurrent_transfers_keep_the_total(self) -> None:
+        db = DataBase(tempfile.mkdtemp(), "data.json", journal=True)
+        account = BankAccount(
+            AccountType(1), Bank("Wise", "Belgium", "01123-1"), balance=1000.0
+        )
+        db.create_records(
+            Person(
+                full_name=f"Customer {i}",
+                age=30,
+                cpf=f"{i:011d}",
+                rg=f"{i:09d}",
+                mom="Mother",
+                dad="Father",
+                bank_account=account,
+            )
+            for i in range(2)
+        )
+
+        def transfer() -> None:
+            while True:
+                try:
+                    with db.transaction() as tx:
+                        for record_id, delta in ((1, -1.0), (2, 1.0)):
+                            account = tx.read_record(record_id)["bank_account"]
+                            balance = account["balance"] + delta
+                            tx.update_record(
+                                record_id,
+                                {"bank_account": {**account, "balance": balance}},
+                            )
+                    return
+                except ValueError:
+                    continue  # a concurrent transfer changed the balances
+
+        def work() -> None:
+            for _ in range(30):
+                transfer()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        balances = [r["bank_account"]["balance"] for r in db.read_records()]
+        self.assertEqual(balances, [760.0, 1240.0])
+
+    def test_stale_read_fails_the_commit(self) -> None:
+        db = DataBase(tempfile.mkdtemp(), "data.json")
+        db.create_record(person(1))
+        tx = db.transaction()
+        age = tx.read_record(1)["age"]
+        db.update_record(1, {"age": 50})
+        tx.update_record(1, {"age": age + 1})
+        with self.assertRaises(ValueError):
+            tx.commit()
+        self.assertEqual(db.read_record(1)["age"], 50)
+
+
+class JournalTest(unittest.TestCase):
+
+    def test_writes_of_another_instance_are_applied_in_place(self) -> None:
+        folder = tempfile.mkdtemp()
+        options = {
+            "journal": True,
+            "compact_threshold": None,
+            "indexes": {"cpf": True},
+            "search_fields": ["full_name"],
+        }
+        first = DataBase(folder, "data.json", **options)
+        first.create_records(person(i) for i in range(4))
+        second = DataBase(folder, "data.json", **options)
+        second.read_records()
+
+        first.update_record(1, {"age": 40})
+        second.delete_record(2)
+        first.create_record(person(1))  # same cpf as the deleted record
+        second.update_record(3, {"full_name": "Renamed"})
+        for db in (first, second):
+            self.assertEqual(db.cache_info()["reloads"], 1)
+            stored = DataBase(folder, "data.json", journal=True).read_records()
+            self.assertEqual(db.read_records(), stored)
+            self.assertEqual(db.find_by("cpf", f"{1:011d}")[0]["id"], 5)
+            self.assertEqual(db.search("Renamed", 1)[0]["id"], 3)
+            self.assertEqual(db.aggregates()["records"], 4)
+
+        first.compact()
+        second.update_record(1, {"age": 41})
+        self.assertEqual(first.read_record(1)["age"], 41)
+        self.assertEqual(first.read_records(), second.read_records())
+
+
+class VersionsTest(unittest.TestCase):
+
+    def test_gc_after_an_aborted_create(self) -> None:
+        folder = tempfile.mkdtemp()
+        options = {"versions": True, "version_retention": 0}
+        db = DataBase(folder, "data.json", **options)
+        db.create_record(person(1))
+        db.update_record(1, {"age": 31})
+
+        def fail(*args, **kwargs) -> None:
+            raise OSError("disk full")
+
+        db._backend.persist = fail
+        with self.assertRaises(OSError):
+            db.create_record(person(2))
+        del db._backend.persist
+        self.assertEqual(db.history(2), [])
+
+        reader = DataBase(folder, "data.json", **options)
+        reader.read_records_as_of(seq=reader.version_seq())
+        self.assertEqual(reader.gc_versions(), 2)
+        self.assertEqual(db.gc_versions(), 0)
+        self.assertEqual(db.read_record(1)["age"], 31)
+
+
+class ChangeFeedTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.db = DataBase(self.folder, "data.json", change_feed=True)
+        self.db.create_records(person(i) for i in range(2))
+
+    def events(self) -> list:
+        return [(e["op"], e["id"]) for e in self.db.changes()]
+
+    def test_failed_write_publishes_nothing(self) -> None:
+        def fail(*args, **kwargs) -> None:
+            raise OSError("disk full")
+
+        self.db._backend.persist = fail
+        with self.assertRaises(OSError):
+            self.db.update_record(1, {"age": 40})
+        del self.db._backend.persist
+        self.db.delete_record(2)
+        self.assertEqual(self.events(), [("insert", 1), ("insert", 2), ("delete", 2)])
+        self.assertEqual(self.db.change_seq(), 4)  # seq 3 was withdrawn
+
+    def test_unsettled_events_are_recovered(self) -> None:
+        def fail(*args, **kwargs) -> None:
+            raise OSError("disk full")
+
+        self.db._feed.commit = fail  # the data is written, its marker is not
+        self.db.update_record(1, {"age": 40})
+        self.assertEqual(self.events(), [("insert", 1), ("insert", 2)])
+        writer = DataBase(self.folder, "data.json", change_feed=True)
+        writer.update_record(2, {"age": 50})
+        expected = [("insert", 1), ("insert", 2), ("update", 1), ("update", 2)]
+        self.assertEqual(self.events(), expected)
+
+        # a writer dies between logging a delete and writing it
+        writer._feed.append([[(1, writer.read_record(1), None)]])
+        self.assertEqual(self.events(), expected)
+        del self.db._feed.commit
+        self.db.update_record(2, {"age": 51})
+        self.assertEqual(self.events(), expected + [("update", 2)])
+        self.assertEqual(self.db.read_record(1)["age"], 40)
+
+
+class ReplicateTest(unittest.TestCase):
+
+    def test_bootstrap_with_delete_before_the_copy(self) -> None:
+        folder = tempfile.mkdtemp()
+        source = DataBase(folder, "source.json", change_feed=True)
+        source.create_records(person(i) for i in range(5))
+        checkpoint = source.change_seq()
+        source.delete_record(2)
+        target = DataBase(folder, "target.json", change_feed=True)
+        migrate(source, target)
+        source.update_record(3, {"age": 50})
+
+        checkpoint = replicate(source, target, checkpoint)
+        self.assertEqual(checkpoint, source.change_seq())
+        self.assertEqual(target.read_records(), source.read_records())
+        self.assertEqual(
+            DataBase(folder, "target.json").read_records(), source.read_records()
+        )
+        self.assertEqual(target.create_record(person(9))["id"], 6)
+
+    def test_migrate_copies_the_banks(self) -> None:
+        folder = tempfile.mkdtemp()
+        source = DataBase(folder, "source.json")
+        account = BankAccount(AccountType(1), Bank("Wise", "Belgium", "01123-1"))
+        source.create_record(
+            Person(
+                full_name="Customer",
+                age=30,
+                cpf="00000000001",
+                rg="1",
+                mom="Mother",
+                dad="Father",
+                bank_account=account,
+            )
+        )
+        for options in ({"backend": "sqlite"}, {"format": "jsonl"}):
+            migrate(source, DataBase(folder, "target.json", **options))
+            target = DataBase(folder, "target.json", **options)
+            holder = target._decoder(1).get_bank_account().get_bank_holder()
+            self.assertEqual(str(holder), "Bank info: Wise, 01123-1, Belgium")
+
+
+class SqliteIndexTest(unittest.TestCase):
+
+    def test_indexed_lookups_use_the_store_index(self) -> None:
+        folder = tempfile.mkdtemp()
+        options = {"backend": "sqlite", "indexes": {"cpf": True, "age": False}}
+        writer = DataBase(folder, "data.json", **options)
+        writer.create_records(person(i) for i in range(5))
+        writer.update_record(2, {"age": 40})
+
+        db = DataBase(folder, "data.json", **options)
+        self.assertEqual(db.find_by("cpf", f"{3:011d}")[0]["id"], 4)
+        self.assertEqual([r["id"] for r in db.find_by("age", 30)], [1, 3, 4, 5])
+        self.assertEqual(
+            db.query({"age": 30, "full_name": "Customer 4"}, fields=["id"]),
+            [{"id": 5}],
+        )
+        self.assertEqual(db.find_by("age", 99), [])
+        self.assertIsNone(db._records)  # answered without a full load
+
+        plan = db._backend._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM records "
+            "WHERE json_extract(data, '$.cpf') IS ?",
+            ("x",),
+        ).fetchall()
+        self.assertIn("idx_cpf", str(plan))
+
+        db._load()
+        self.assertEqual([r["id"] for r in db.find_by("age", 40)], [2])
+
+
+class SqliteAggregatesTest(unittest.TestCase):
+
+    def test_totals_are_saved_with_the_records(self) -> None:
+        folder = tempfile.mkdtemp()
+        writer = DataBase(folder, "data.json", backend="sqlite")
+        writer.create_records(person(i) for i in range(4))
+        writer.delete_record(1)
+
+        reader = DataBase(folder, "data.json", backend="sqlite")
+        self.assertEqual(reader.aggregates()["records"], 3)
+        self.assertIsNone(reader._records)  # read back, not rebuilt
+
+        writer.create_record(person(9))
+        self.assertEqual(reader.aggregates()["records"], 4)
+        self.assertIsNone(reader._records)
+
+    def test_corrupt_totals_are_rebuilt(self) -> None:
+        folder = tempfile.mkdtemp()
+        db = DataBase(folder, "data.json", backend="sqlite")
+        db.create_records(person(i) for i in range(2))
+        db._backend.write_meta("aggregates", {"values": {"records": "x"}})
+
+        reader = DataBase(folder, "data.json", backend="sqlite")
+        self.assertEqual(reader.aggregates()["records"], 2)
+        self.assertEqual(
+            DataBase(folder, "data.json", backend="sqlite")._backend.read_meta(
+                "aggregates"
+            )["values"]["records"],
+            2,
+        )
+
+
+class PWDBTest(unittest.TestCase):
+
+    def test_credentials_follow_the_cpf_not_the_name(self) -> None:
+        folder = tempfile.mkdtemp()
+        users = USDB(folder)
+        namesake = Person(
+            full_name="Customer 1", age=50, cpf="99999999999", rg="9", mom="Other"
+        )
+        users.create_record(namesake)
+        pass_db = PWDB(folder, users=users, work_factor=1000)
+
+        self.assertFalse(pass_db.read_record_by_user(person(1))[0])
+        credential = pass_db.create_record_pwd("customer", "secret", person(1))
+        self.assertEqual(users.read_record(credential["user_id"])["cpf"], f"{1:011d}")
+        self.assertTrue(pass_db.read_record_by_user(person(1))[0])
+        self.assertFalse(pass_db.read_record_by_user(namesake)[0])
+        self.assertTrue(pass_db.login_user_pwd(person(1), "customer", "secret"))
+        self.assertFalse(pass_db.login_user_pwd(namesake, "customer", "secret"))
+
+
+if __name__ == "__main__":
+    unittest.main()
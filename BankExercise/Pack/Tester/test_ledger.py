@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from datetime import date
+
+from Pack.Structure.Bank import AccountType, Bank, BankAccount
+from Pack.Structure.DataBase import USDB
+from Pack.Structure.Interest import accrue_interest
+from Pack.Structure.Ledger import Ledger
+from Pack.Structure.Person import Person
+
+'''
+regression tests for Ledger.
+run from the BankExercise folder:
+    python -m unittest Pack.Tester.test_ledger
+'''
+
+
+def person(i:int, balance:float) -> Person:
+    return Person(
+        full_name=f"Customer {i}",
+        age=30,
+        cpf=f"{i:011d}",
+        rg=f"{i:09d}",
+        mom="Mother",
+        dad="Father",
+        bank_account=BankAccount(
+            AccountType(1), Bank("Wise", "Belgium", "01123-1"), level=2, balance=balance
+        ),
+    )
+
+
+class LedgerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = USDB(tempfile.mkdtemp())
+        self.db.create_records([person(1, 100.0), person(2, 100.0)])
+        self.ledger = Ledger(self.db)
+
+    def stored(self, account:int) -> float:
+        return self.db.read_record(account)["bank_account"]["balance"]
+
+    def test_interest_accrued_outside_the_ledger_is_kept(self) -> None:
+        self.ledger.deposit(1, 50)
+        self.assertEqual(self.stored(1), 150.0)
+        accrue_interest(self.db, 0.1065, date(2024, 1, 1), date(2024, 12, 31))
+        with_interest = self.stored(1)
+        self.assertGreater(with_interest, 150.0)
+
+        self.ledger.deposit(1, 10)
+        self.assertEqual(self.stored(1), round(with_interest + 10, 2))
+        self.assertEqual(self.ledger.balance(1), self.stored(1))
+        kinds = [e["kind"] for e in self.ledger.statement(1, 0)["entries"]]
+        self.assertEqual(kinds, ["open", "deposit", "adjustment", "deposit"])
+
+    def test_postings_of_another_ledger_are_kept(self) -> None:
+        other = Ledger(USDB(self.db._file.rsplit("/", 1)[0]))
+        self.ledger.deposit(1, 10)
+        other.transfer(1, 2, 30)
+        self.ledger.deposit(1, 5)
+        self.assertEqual(self.stored(1), 85.0)
+        self.assertEqual(self.stored(2), 130.0)
+        self.assertEqual(self.ledger.balance(2), 130.0)
+        kinds = [e["kind"] for e in self.ledger.statement(1, 0)["entries"]]
+        self.assertNotIn("adjustment", kinds)
+
+    def test_failed_posting_changes_nothing(self) -> None:
+        with self.assertRaises(ValueError):
+            self.ledger.transfer(1, 2, 1000)
+        with self.assertRaises(ValueError):
+            self.ledger.deposit(42, 10)
+        self.assertEqual(self.stored(1), 100.0)
+        self.assertEqual(self.ledger.statement(1, 0)["entries"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+
+from Pack.Structure.Person import Person
+from Pack.Structure.Sharded import ShardedDataBase
+
+'''
+regression tests for ShardedDataBase.
+run from the BankExercise folder:
+    python -m unittest Pack.Tester.test_sharded
+'''
+
+
+def person(i:int) -> Person:
+    return Person(
+        full_name=f"Customer {i}",
+        age=30,
+        cpf=f"{i:011d}",
+        rg=f"{i:09d}",
+        mom="Mother",
+        dad="Father",
+    )
+
+
+class CreateTest(unittest.TestCase):
+
+    def test_create_reads_one_shard(self) -> None:
+        folder = tempfile.mkdtemp()
+        ShardedDataBase(folder, shards=4).create_records(person(i) for i in range(8))
+        db = ShardedDataBase(folder, shards=4, workers=0)
+        created = db.create_record(person(8))
+        loaded = [shard for shard in db._shards if shard._records is not None]
+        self.assertEqual(loaded, [db._shards[db.shard_of(created["id"])]])
+
+    def test_ids_stay_unique_across_instances(self) -> None:
+        folder = tempfile.mkdtemp()
+        first = ShardedDataBase(folder, shards=3, workers=0)
+        second = ShardedDataBase(folder, shards=3, workers=0)
+        ids = [first.create_record(person(i))["id"] for i in range(6)]
+        ids += [second.create_record(person(i))["id"] for i in range(6, 12)]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(sorted(r["id"] for r in first.read_records()), sorted(ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import argparse
+
+from Pack.Structure.DataBase import PWDB, USDB, migrate
+
+TARGETS = {
+    "sqlite": {"backend": "sqlite"},
+    "jsonl": {"format": "jsonl"},
+    "binary": {"format": "binary"},
+}
+
+
+def main():
+    '''
+    Copy an existing user_data.json and pass_data.json into another backend
+    or file format.
+    '''
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--user-dir", default="UserData", help="folder of user_data.json")
+    parser.add_argument("--pass-dir", default="PassData", help="folder of pass_data.json")
+    parser.add_argument("--to", choices=sorted(TARGETS), default="sqlite", help="target store")
+    args = parser.parse_args()
+
+    for db_class, folder in ((USDB, args.user_dir), (PWDB, args.pass_dir)):
+        source = db_class(folder)
+        target = db_class(folder, **TARGETS[args.to])
+        count = migrate(source, target)
+        print(f"{count} records copied from {source} to {target}")
+        target.close()
+
+
+if __name__ == "__main__":
+    main()